@@ -1,15 +1,26 @@
 from flask import Flask, request, abort
-import json
+import os
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from jwks import JWKSError
+from signing_keys import key_source
+from token_cache import VerifiedTokenCache, register_token_cache_metrics
 
 
 app = Flask(__name__)
 
-AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'localhost')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'dev')
+# Keys verifying the tokens: the JWKS of the tenant, cached and refreshed
+# in the background (see jwks.py), or the local key or key set named by
+# AUTH_KEY_FILE / JWKS_URL (see signing_keys.py)
+signing_keys = key_source(AUTH0_DOMAIN)
+# Payloads of the tokens already verified, counters at /internal/auth-cache
+# when METRICS_TOKEN is set
+verified_tokens = VerifiedTokenCache()
+register_token_cache_metrics(app, verified_tokens)
 
 
 class AuthError(Exception):
@@ -29,22 +40,17 @@ def get_token_auth_header():
         }, 401)
 
     parts = auth.split()
-    if parts[0].lower() != 'bearer':
+    if len(parts) != 2:
         raise AuthError({
             'code': 'invalid_header',
-            'description': 'Authorization header must start with "Bearer".'
+            'description': 'Token not found.' if len(parts) < 2
+            else 'Authorization header must be bearer token.'
         }, 401)
 
-    elif len(parts) == 1:
+    elif parts[0].lower() != 'bearer':
         raise AuthError({
             'code': 'invalid_header',
-            'description': 'Token not found.'
-        }, 401)
-
-    elif len(parts) > 2:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must be bearer token.'
+            'description': 'Authorization header must start with "Bearer".'
         }, 401)
 
     token = parts[1]
@@ -52,25 +58,35 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 401)
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    try:
+        key = signing_keys.get(unverified_header['kid'])
+    except JWKSError:
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 503)
+    rsa_key = {}
+    if key is not None:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -108,12 +124,15 @@ def verify_decode_jwt(token):
 def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        token = get_token_auth_header()
         try:
-            payload = verify_decode_jwt(token)
-        except:
-            abort(401)
-        return f(payload, *args, **kwargs)
+            token = get_token_auth_header()
+            verified = verified_tokens.get(token)
+            if verified is None:
+                verified = verified_tokens.put(token, verify_decode_jwt(token))
+        except AuthError as error:
+            # 503 when the signing keys can't be fetched
+            abort(error.status_code)
+        return f(verified.payload, *args, **kwargs)
 
     return wrapper
 
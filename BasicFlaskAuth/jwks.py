@@ -0,0 +1,159 @@
+import json
+import logging
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+# Cache of the JSON Web Key Set used to verify access tokens. BasicFlaskAuth
+# keeps a copy of the coffee shop's src/auth/jwks.py, written by
+# `python tools/shared_files.py --sync`. Keys are looked up by `kid` in
+# memory, the set is only downloaded:
+#   - on the first lookup,
+#   - in a background thread once it is older than its Cache-Control
+#     max-age (DEFAULT_TTL without one), requests keep the current keys,
+#   - on demand when a token names an unknown `kid` (a key rotation), at
+#     most once per MIN_FETCH_INTERVAL. Kids still unknown afterwards are
+#     rejected without a download for NEGATIVE_TTL seconds.
+# A single download runs at a time. When the IdP is unreachable the last
+# keys are kept and the download retried after RETRY_AFTER seconds.
+# The url may be a file:// url, or point to a stub server, for tests.
+DEFAULT_TTL = 10 * 60
+MIN_TTL = 60
+MAX_TTL = 24 * 60 * 60
+MIN_FETCH_INTERVAL = 10
+NEGATIVE_TTL = 5 * 60
+RETRY_AFTER = 30
+FETCH_TIMEOUT = 5
+# Unknown kids remembered, the oldest are forgotten first
+MAX_UNKNOWN_KIDS = 1000
+
+MAX_AGE = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+NO_CACHE = re.compile(r'(?:^|,)\s*no-(?:cache|store)\b', re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSError(Exception):
+    '''
+    No key set could be downloaded yet.
+    '''
+
+
+def cache_ttl(cache_control, default=DEFAULT_TTL):
+    # Seconds the key set may be used for, clamped to [MIN_TTL, MAX_TTL]
+    if not cache_control:
+        return default
+    if NO_CACHE.search(cache_control):
+        return MIN_TTL
+    match = MAX_AGE.search(cache_control)
+    if match is None:
+        return default
+    return min(max(int(match.group(1)), MIN_TTL), MAX_TTL)
+
+
+class JWKSCache(object):
+    '''
+    Keys of the JWKS at `url` by kid, see the top of this file.
+    '''
+
+    def __init__(self, url, timeout=FETCH_TIMEOUT, opener=urlopen):
+        self.url = url
+        self.timeout = timeout
+        self.opener = opener
+        # kid -> JWK, None until the first download
+        self.keys = None
+        self.expires = 0.0
+        self.fetched_at = None
+        # earliest time of the next download
+        self.next_fetch = 0.0
+        # kid -> time until which it is known to be missing
+        self.unknown = {}
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+
+    def get(self, kid):
+        '''
+        JWK of `kid`, None when the key set doesn't have it. Raises
+        JWKSError when no key set could be downloaded.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            keys = self.keys
+            unknown_until = self.unknown.get(kid, 0.0)
+        if keys is None:
+            self.fetch()
+            with self.lock:
+                keys = self.keys
+        key = keys.get(kid)
+        if key is not None:
+            if now >= self.expires:
+                self.refresh_in_background()
+            return key
+        if unknown_until > now:
+            return None
+        self.fetch()
+        with self.lock:
+            key = self.keys.get(kid)
+            if key is None:
+                if len(self.unknown) >= MAX_UNKNOWN_KIDS:
+                    del self.unknown[next(iter(self.unknown))]
+                # only a key set downloaded after the lookup started proves
+                # the kid is missing, otherwise retry once downloads resume
+                if self.fetched_at is not None and self.fetched_at >= now:
+                    self.unknown[kid] = time.monotonic() + NEGATIVE_TTL
+                else:
+                    self.unknown[kid] = self.next_fetch
+        return key
+
+    def fetch(self):
+        '''
+        Downloads the key set unless another download just ran (or failed),
+        waits for the one in flight.
+        '''
+        with self.fetch_lock:
+            now = time.monotonic()
+            if now < self.next_fetch:
+                if self.keys is None:
+                    raise JWKSError('JWKS unavailable from ' + self.url)
+                return
+            try:
+                keys, ttl = self.download()
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                logger.warning('JWKS download from %s failed: %s', self.url, error)
+                self.next_fetch = time.monotonic() + RETRY_AFTER
+                if self.keys is None:
+                    raise JWKSError('JWKS unavailable from ' + self.url)
+                return
+            now = time.monotonic()
+            with self.lock:
+                self.keys = keys
+                self.expires = now + ttl
+                self.fetched_at = now
+                self.unknown = {kid: until for kid, until in self.unknown.items()
+                                if until > now and kid not in keys}
+            self.next_fetch = now + MIN_FETCH_INTERVAL
+
+    def download(self):
+        with self.opener(self.url, timeout=self.timeout) as response:
+            document = json.loads(response.read().decode('utf-8'))
+            cache_control = response.headers.get('Cache-Control')
+        keys = {key['kid']: key for key in document['keys'] if 'kid' in key}
+        return keys, cache_ttl(cache_control)
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing or time.monotonic() < self.next_fetch:
+                return
+            self.refreshing = True
+        thread = threading.Thread(target=self._refresh, name='jwks-refresh')
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self):
+        try:
+            self.fetch()
+        finally:
+            with self.lock:
+                self.refreshing = False
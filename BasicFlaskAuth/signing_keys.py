@@ -0,0 +1,199 @@
+import argparse
+import base64
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+try:
+    from .jwks import JWKSCache
+except ImportError:  # BasicFlaskAuth, or run as a script
+    from jwks import JWKSCache
+
+# Sources of the keys verifying access tokens. BasicFlaskAuth keeps a copy
+# of the coffee shop's src/auth/signing_keys.py, written by
+# `python tools/shared_files.py --sync`. `key_source()` picks one from the
+# environment:
+#   AUTH_KEY_FILE  PEM file of a local RSA key (private or public), tokens
+#                  minted with the private key verify without any network
+#   JWKS_URL       key set served at this url (a file:// url or a stub
+#                  server for tests), cached by jwks.JWKSCache
+# and otherwise the JWKS of the Auth0 tenant.
+#
+# The command line mints keys and tokens for tests and benchmarks (run it
+# as `python -m src.auth.signing_keys` from the coffee shop backend):
+#   python signing_keys.py keygen key.pem
+#   python signing_keys.py jwks key.pem > jwks.json
+#   python signing_keys.py token key.pem -p get:drinks-detail --expires-in 3600
+#   python signing_keys.py serve key.pem --port 8765
+ALGORITHM = 'RS256'
+DEFAULT_EXPIRES_IN = 60 * 60
+KEY_SIZE = 2048
+
+
+def generate_key(bits=KEY_SIZE):
+    # PEM of a new RSA private key
+    return RSA.generate(bits).exportKey('PEM').decode('ascii')
+
+
+def base64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def public_jwk(pem):
+    '''
+    Public JWK of the RSA key `pem`, its kid is derived from the key so the
+    same key always gets the same kid.
+    '''
+    key = RSA.importKey(pem)
+    n, e = base64url_uint(key.n), base64url_uint(key.e)
+    kid = hashlib.sha256('{}.{}'.format(e, n).encode('ascii')).hexdigest()[:16]
+    return {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'alg': ALGORITHM,
+            'n': n, 'e': e}
+
+
+class LocalKeySource(object):
+    '''
+    The public key of a local RSA key, looked up like `JWKSCache.get`.
+    '''
+
+    def __init__(self, pem):
+        self.jwk = public_jwk(pem)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as file:
+            return cls(file.read())
+
+    def get(self, kid):
+        return self.jwk if kid == self.jwk['kid'] else None
+
+    def jwks(self):
+        return {'keys': [self.jwk]}
+
+
+def key_source(domain, environ=os.environ):
+    if environ.get('AUTH_KEY_FILE'):
+        return LocalKeySource.from_file(environ['AUTH_KEY_FILE'])
+    return JWKSCache(environ.get(
+        'JWKS_URL', 'https://{}/.well-known/jwks.json'.format(domain)))
+
+
+def auth_settings():
+    # Module holding the AUTH0_DOMAIN and API_AUDIENCE checked by the app,
+    # imported on first use as it imports this one
+    if __package__:
+        return importlib.import_module('.auth', __package__)  # coffee shop
+    return importlib.import_module('app')  # BasicFlaskAuth
+
+
+def mint_token(pem, permissions=(), expires_in=DEFAULT_EXPIRES_IN,
+               issuer=None, audience=None, subject='local|tester', **claims):
+    '''
+    RS256 access token signed by the private key `pem`, shaped like the
+    Auth0 ones: `permissions`, expiring `expires_in` seconds from now.
+    The issuer and audience default to the ones the app verifies, its
+    AUTH0_DOMAIN and API_AUDIENCE.
+    '''
+    if issuer is None or audience is None:
+        settings = auth_settings()
+        issuer = issuer or 'https://{}/'.format(settings.AUTH0_DOMAIN)
+        audience = audience or settings.API_AUDIENCE
+    now = int(time.time())
+    claims.update({
+        'iss': issuer,
+        'aud': audience,
+        'sub': subject,
+        'iat': now,
+        'exp': now + expires_in,
+        'permissions': list(permissions),
+    })
+    return jwt.encode(claims, pem, algorithm=ALGORITHM,
+                      headers={'kid': public_jwk(pem)['kid']})
+
+
+def serve_jwks(jwks, port=0, max_age=600):
+    '''
+    Stub IdP serving `jwks` at /.well-known/jwks.json from a background
+    thread. Returns the server, its url is `server.jwks_url`.
+    '''
+    body = json.dumps(jwks).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/.well-known/jwks.json':
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'max-age={}'.format(max_age))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', port), Handler)
+    server.jwks_url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(
+        server.server_port)
+    thread = threading.Thread(target=server.serve_forever, name='jwks-stub')
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Local RSA keys and access tokens for tests.')
+    commands = parser.add_subparsers(dest='command')
+    keygen = commands.add_parser('keygen', help='write a new private key')
+    keygen.add_argument('key')
+    keygen.add_argument('--bits', type=int, default=KEY_SIZE)
+    jwks = commands.add_parser('jwks', help='print the JWKS of a key')
+    jwks.add_argument('key')
+    token = commands.add_parser('token', help='print a signed access token')
+    token.add_argument('key')
+    token.add_argument('-p', '--permission', action='append', default=[])
+    token.add_argument('--expires-in', type=int, default=DEFAULT_EXPIRES_IN)
+    token.add_argument('--issuer')
+    token.add_argument('--audience')
+    token.add_argument('--subject', default='local|tester')
+    serve = commands.add_parser('serve', help='serve the JWKS of a key')
+    serve.add_argument('key')
+    serve.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'keygen':
+        with open(args.key, 'x') as file:
+            file.write(generate_key(args.bits))
+        os.chmod(args.key, 0o600)
+        return
+    if args.command is None:
+        parser.error('a command is required')
+    with open(args.key) as file:
+        pem = file.read()
+    if args.command == 'jwks':
+        print(json.dumps(LocalKeySource(pem).jwks(), indent=2))
+    elif args.command == 'token':
+        print(mint_token(pem, args.permission, args.expires_in, args.issuer,
+                         args.audience, args.subject))
+    else:
+        server = serve_jwks(LocalKeySource(pem).jwks(), args.port)
+        print('JWKS_URL=' + server.jwks_url, file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,467 +2,584 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import os
+import tempfile
 from datetime import datetime
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from sqlalchemy import func, between
+from itertools import groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort
+from sqlalchemy import func, case, select
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import logging
-from logging import Formatter, FileHandler, log
-from flask_wtf import FlaskForm
-from sqlalchemy.sql.selectable import subquery
+from logging import Formatter, FileHandler
+import config
 from forms import VenueForm, ArtistForm, ShowForm
+from models import (
+    db, Genre, Venue, Artist, Show, venue_genres, artist_genres,
+    venue_search, artist_search, refresh_show_counters,
+    roll_show_counters_command, rebuild_show_counters_command,
+    sync_show_copies_command
+)
+from pagination import paginate_keyset, InvalidCursor
+from filters import register_filters, warmup_filters
+from cache import PageCache
+from engine_config import configure_engine, register_pool_metrics
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Extensions are bound to the application by `create_app()`
+moment = Moment()
+migrate = Migrate()
+page_cache = PageCache()
+
+# Upcoming/past shows listed on venue and artist pages
+SHOWS_PREVIEW_LIMIT = 12
+# Sort keys of the paginated listings, the last column must be unique
+SHOWS_ORDER = ('start_time', 'id')
+ARTISTS_ORDER = ('name', 'id')
+# Venues are listed by area, a NULL city or state sorts as an empty one
+VENUES_ORDER = (
+    func.coalesce(Venue.city, '').label('city'),
+    func.coalesce(Venue.state, '').label('state'),
+    'id'
+)
+
+
+def load_secret_key(path):
+    # Generated once per host, later processes read the same key. The key is
+    # written aside then linked in place, a worker losing the race reads the
+    # winner's key instead of overwriting it.
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(os.urandom(32))
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.remove(temp_path)
+    with open(path, 'rb') as file:
+        return file.read()
 
 #----------------------------------------------------------------------------#
-# Models.
+# Pagination.
 #----------------------------------------------------------------------------#
 
 
-class Venue(db.Model):
-    __tablename__ = 'Venue'
+def wants_json():
+    return request.args.get('format') == 'json' or \
+        request.accept_mimetypes.best == 'application/json'
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    shows = db.relationship("Show", backref="venue", cascade="all,delete")
 
-    """
-    {
-        "city": "San Francisco",
-        "state": "CA",
-        "venues": [{
-            "id": 1,
-            "name": "The Musical Hop",
-            "num_upcoming_shows": 0,
-        }, {
-            "id": 3,
-            "name": "Park Square Live Music & Coffee",
-            "num_upcoming_shows": 1,
-        }]
-    }
-    """
-
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String(500))
-    shows = db.relationship("Show", backref="artist", cascade="delete,all")
-
-    # Step 2: implement any missing fields, as a database migration using Flask-Migrate
-
-    """
-    {
-        "id": 1,
-        "name": "The Musical Hop",
-        "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-        "address": "1015 Folsom Street",
-        "city": "San Francisco",
-        "state": "CA",
-        "phone": "123-123-1234",
-        "website": "https://www.themusicalhop.com",
-        "facebook_link": "https://www.facebook.com/TheMusicalHop",
-        "seeking_talent": True,
-        "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-        "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-        "past_shows": [{
-            "artist_id": 4,
-            "artist_name": "Guns N Petals",
-            "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-            "start_time": "2019-05-21T21:30:00.000Z"
-        }],
-        "upcoming_shows": [],
-        "past_shows_count": 1,
-        "upcoming_shows_count": 0,
-    }
-    """
-
-
-# Step 1: Implement Show and Artist models,
-# and complete all model relationships and properties,
-# as a database migration.
-# (Making it easier to figuer out relations and properties with other models)
-
-class Show(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
-    venue_name = db.Column(db.String(120))
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ))
-    artist_name = db.Column(db.String(120))
-    artist_image_link = db.Column(db.String)
-    start_time = db.Column(db.DateTime)
-
-    """
-    {
-        "venue_id": 1,
-        "venue_name": "The Musical Hop",
-        "artist_id": 4,
-        "artist_name": "Guns N Petals",
-        "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-        "start_time": "2019-05-21T21:30:00.000Z"
+def paginate(query, model, order, descending=False):
+    # Pages through `query` using the `after` and `limit` request arguments,
+    # `order` holds column names of `model` or sort expressions
+    try:
+        return paginate_keyset(
+            query,
+            [getattr(model, column) if isinstance(column, str) else column
+             for column in order],
+            after=request.args.get('after'),
+            limit=request.args.get('limit', None, type=int),
+            descending=descending
+        )
+    except InvalidCursor:
+        abort(400)
+
+
+def next_page_url(page, **values):
+    if page.next_cursor is None:
+        return None
+    limit = request.args.get('limit', None, type=int)
+    return url_for(request.endpoint, after=page.next_cursor, limit=limit, **values)
+
+
+def show_to_dict(show):
+    return {
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
+        "artist_id": show.artist_id,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time": show.start_time.isoformat() if show.start_time else None
     }
-    """
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
 
-def format_datetime(value, format='medium'):
-    value = value if value is str else value.isoformat(" ")
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
 
-
-app.jinja_env.filters['datetime'] = format_datetime
+def show_owner_ids(column, condition):
+    # Venues or artists sharing shows with an entity, their cached pages
+    # list its copied fields
+    return [id for (id,) in Show.query.with_entities(column)
+            .filter(condition).distinct()]
 
 #----------------------------------------------------------------------------#
-# Controllers.
+# View helpers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
-def index():
-    recent_venues = Venue.query.limit(10).all()
-    recent_artists = Artist.query.limit(10).all()
-    return render_template('pages/home.html', recent_venues=recent_venues, recent_artists=recent_artists)
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-    data = []
-    # Could not figuer out more effecient way since
-    # SQLAlchemy does not support nested queries (venue list inside grouped Venues by city)
-
-    # Grapping upcoming shows as subquery
-    show_query = Show.query.with_entities(Show.id).filter(
-        Show.start_time >= datetime.now()).subquery()
-    # Grabbing all venues with aggregated `num_upcoming_shows` field
-    venue_query = Venue.query.outerjoin(Venue.shows).with_entities(
-        Venue.id.label("id"), Venue.name.label("name"), func.count(Show.id.in_(show_query)).label("num_upcoming_shows")).group_by(Venue.id)
-    # Grabbing venues grouped by City and state
-    venues = Venue.query.with_entities(
-        Venue.city,
-        Venue.state,
-    ).group_by(Venue.city, Venue.state).all()
-    # Mapping venues to their respective city and state
-    # `venue_query` was not executed earlier to avoid loading big amount of data in the memory
-    # the trade-off is making requests to the database for each venue
-    # another solution would be sacrificing memory, loading all venues from `venue_query` and filtring manually
-    for venue in venues:
-        data.append({
-            "city": venue.city,
-            "state": venue.state,
-            "venues": venue_query.filter(
-                Venue.city == venue.city, Venue.state == venue.state).all()
-        })
-    return render_template('pages/venues.html', areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    # implement search on artists with partial string search
-    results = []
-    search_term = request.form.get("search_term", None)
-    if search_term:
-        results = Venue.query.filter(
-            Venue.name.ilike(f"%{search_term}%")).all()
-    response = {
-        "count": len(results),
-        "data": results
-    }
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # shows the venue page with the given venue_id
-    data = Venue.query.get_or_404(venue_id)
-    shows = Show.query.filter(Show.venue_id == venue_id).all()
-    upcoming_shows = list(
-        filter(lambda show: show.start_time >= datetime.now(), shows))
-    past_shows = list(
-        filter(lambda show: show.start_time < datetime.now(), shows))
-    data.upcoming_shows = upcoming_shows
-    data.past_shows = past_shows
-    data.upcoming_shows_count = len(upcoming_shows)
-    data.past_shows_count = len(past_shows)
-    return render_template('pages/show_venue.html', venue=data)
+def group_venues_by_area(rows):
+    # `rows` must be ordered by city and state
+    return [{
+        "city": city,
+        "state": state,
+        "venues": [{
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.num_upcoming_shows,
+        } for venue in venues]
+    } for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state))]
+
+
+def search_results(search, search_term, show_fk):
+    # Ranked matches along with their (materialized) upcoming shows count
+    entities = search.search(search_term)
+    refresh_show_counters(entities, show_fk, datetime.now())
+    return [{
+        "id": entity.id,
+        "name": entity.name,
+        "num_upcoming_shows": entity.upcoming_shows_count,
+    } for entity in entities]
+
+
+def shows_preview(condition, now):
+    # First pages of the nearest upcoming and latest past shows, both read
+    # from the (venue_id|artist_id, start_time) indexes
+    upcoming_shows = paginate_keyset(
+        Show.query.filter(condition, Show.start_time >= now),
+        [Show.start_time, Show.id], limit=SHOWS_PREVIEW_LIMIT)
+    past_shows = paginate_keyset(
+        Show.query.filter(condition, Show.start_time < now),
+        [Show.start_time, Show.id], limit=SHOWS_PREVIEW_LIMIT, descending=True)
+    return upcoming_shows, past_shows
+
+
+def owner_shows(condition, when, **values):
+    # Paginated upcoming (soonest first) or past (latest first) shows
+    # of a single venue or artist
+    now = datetime.now()
+    if when == 'upcoming':
+        query = Show.query.filter(condition, Show.start_time >= now)
+    elif when == 'past':
+        query = Show.query.filter(condition, Show.start_time < now)
+    else:
+        abort(400)
+    page = paginate(query, Show, SHOWS_ORDER, descending=(when == 'past'))
+    if wants_json():
+        return jsonify(
+            shows=[show_to_dict(show) for show in page.items],
+            next_cursor=page.next_cursor
+        )
+    return render_template(
+        'pages/shows.html',
+        shows=page.items,
+        next_url=next_page_url(page, when=when, **values),
+        first_url=url_for(request.endpoint, when=when, **values)
+    )
 
-#  Create Venue
-#  ----------------------------------------------------------------
 
+def genre_id_or_404(name):
+    genre = Genre.query.filter(Genre.name == name).first_or_404()
+    return genre.id
 
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
+#----------------------------------------------------------------------------#
+# Application factory.
+#----------------------------------------------------------------------------#
 
 
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    form = None
-    try:
-        venue = Venue()
+def create_app(config_name=None):
+    # `config_name` is one of `config.profiles`, FYYUR_CONFIG by default
+    config_name = config_name or os.environ.get('FYYUR_CONFIG', config.DEFAULT_PROFILE)
+    app = Flask(__name__)
+    app.config.from_object(config.profiles[config_name])
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = load_secret_key(app.config['SECRET_KEY_FILE'])
+    configure_engine(app)
+    db.init_app(app)
+    register_pool_metrics(app, db)
+    migrate.init_app(app, db)
+    moment.init_app(app)
+    page_cache.init_app(app)
+    register_filters(app.jinja_env)
+    app.cli.add_command(roll_show_counters_command)
+    app.cli.add_command(rebuild_show_counters_command)
+    app.cli.add_command(sync_show_copies_command)
+
+    #----------------------------------------------------------------------------#
+    # Controllers.
+    #----------------------------------------------------------------------------#
+
+    @app.route('/')
+    @page_cache.cached('venues', 'artists')
+    def index():
+        recent_venues = Venue.query.limit(10).all()
+        recent_artists = Artist.query.limit(10).all()
+        return render_template('pages/home.html', recent_venues=recent_venues, recent_artists=recent_artists)
+
+    #  Venues
+    #  ----------------------------------------------------------------
+
+    @app.route('/venues')
+    @page_cache.cached('venues', 'shows')
+    def venues():
+        # A page of venues is fetched in a single statement ordered by area
+        # and grouped in Python, instead of one query per city/state pair.
+        # The rendered pages are cached whole (see `page_cache`).
+        upcoming_shows = case([(Show.start_time >= datetime.now(), Show.id)])
+        venue_query = Venue.query
+        genre = request.args.get('genre')
+        if genre:
+            venue_query = venue_query.join(venue_genres).filter(
+                venue_genres.c.genre_id == genre_id_or_404(genre))
+        venue_query = venue_query.outerjoin(Venue.shows).with_entities(
+            *VENUES_ORDER[:2],
+            Venue.id,
+            Venue.name,
+            func.count(upcoming_shows).label("num_upcoming_shows")
+        ).group_by(Venue.city, Venue.state, Venue.id, Venue.name)
+        page = paginate(venue_query, Venue, VENUES_ORDER)
+        return render_template(
+            'pages/venues.html',
+            areas=group_venues_by_area(page.items),
+            next_url=next_page_url(page, genre=genre),
+            first_url=url_for('venues', genre=genre),
+            genre=genre
+        )
+
+    @app.route('/venues/search', methods=['POST'])
+    def search_venues():
+        # implement search on artists with partial string search
+        search_term = request.form.get("search_term", None)
+        results = search_results(venue_search, search_term, 'venue_id')
+        response = {
+            "count": len(results),
+            "data": results
+        }
+        return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+    @app.route('/venues/<int:venue_id>')
+    @page_cache.cached('venue:{venue_id}')
+    def show_venue(venue_id):
+        # shows the venue page with the given venue_id
+        data = Venue.query.get_or_404(venue_id)
+        now = datetime.now()
+        refresh_show_counters([data], 'venue_id', now)
+        upcoming, past = shows_preview(Show.venue_id == venue_id, now)
+        data.upcoming_shows, data.past_shows = upcoming.items, past.items
+        data.upcoming_shows_url = upcoming.next_cursor and url_for(
+            'venue_shows', venue_id=venue_id, when='upcoming')
+        data.past_shows_url = past.next_cursor and url_for(
+            'venue_shows', venue_id=venue_id, when='past')
+        return render_template('pages/show_venue.html', venue=data)
+
+    @app.route('/venues/<int:venue_id>/shows')
+    @page_cache.cached('venue:{venue_id}')
+    def venue_shows(venue_id):
+        return owner_shows(Show.venue_id == venue_id,
+                           request.args.get('when', 'upcoming'), venue_id=venue_id)
+
+    #  Create Venue
+    #  ----------------------------------------------------------------
+
+    @app.route('/venues/create', methods=['GET'])
+    def create_venue_form():
         form = VenueForm()
-        # make sure form is valid
-        # if not, raise an error
-        assert(form.validate_on_submit())
-        form.populate_obj(venue)
-        db.session.add(venue)
-        db.session.commit()
-        # on successful db insert, flash success
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-    except Exception as err:
-        print(err, form.errors)
-        # In case of Database error or form validation error
-        # alert the user and return the same form data
-        flash('An error occurred. Venue ' +
-              request.form['name'] + ' could not be listed.', 'error')
         return render_template('forms/new_venue.html', form=form)
-    return render_template('pages/home.html')
 
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # Step 3: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    try:
+    @app.route('/venues/create', methods=['POST'])
+    def create_venue_submission():
+        form = None
+        try:
+            venue = Venue()
+            form = VenueForm()
+            # make sure form is valid
+            # if not, raise an error
+            assert(form.validate_on_submit())
+            form.populate_obj(venue)
+            db.session.add(venue)
+            db.session.commit()
+            page_cache.invalidate('venues')
+            # on successful db insert, flash success
+            flash('Venue ' + request.form['name'] + ' was successfully listed!')
+        except Exception as err:
+            print(err, form.errors)
+            # In case of Database error or form validation error
+            # alert the user and return the same form data
+            flash('An error occurred. Venue ' +
+                  request.form['name'] + ' could not be listed.', 'error')
+            return render_template('forms/new_venue.html', form=form)
+        return render_template('pages/home.html')
+
+    @app.route('/venues/<venue_id>', methods=['DELETE'])
+    def delete_venue(venue_id):
+        # Step 3: Complete this endpoint for taking a venue_id, and using
+        # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+        try:
+            venue = Venue.query.get_or_404(venue_id)
+            artist_ids = show_owner_ids(Show.artist_id, Show.venue_id == venue.id)
+            db.session.delete(venue)
+            db.session.commit()
+            page_cache.invalidate('venues', 'shows', 'venue:{}'.format(venue_id),
+                                  *['artist:{}'.format(id) for id in artist_ids])
+            flash('Venue ID ' + venue_id + ' deleted successfully.', 'info')
+            return Response(status=202)
+        except:
+            flash('An error occurred. Venue ID ' +
+                  venue_id + ' could not be deleted.', 'error')
+            # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+            # clicking that button delete it from the db then redirect the user to the homepage
+        return Response(status=400)
+
+    #  Artists
+    #  ----------------------------------------------------------------
+
+    @app.route('/artists')
+    @page_cache.cached('artists')
+    def artists():
+        artist_query = Artist.query
+        genre = request.args.get('genre')
+        if genre:
+            artist_query = artist_query.join(artist_genres).filter(
+                artist_genres.c.genre_id == genre_id_or_404(genre))
+        page = paginate(artist_query.with_entities(Artist.id, Artist.name),
+                        Artist, ARTISTS_ORDER)
+        if wants_json():
+            return jsonify(
+                artists=[{"id": artist.id, "name": artist.name}
+                         for artist in page.items],
+                next_cursor=page.next_cursor
+            )
+        return render_template(
+            'pages/artists.html',
+            artists=page.items,
+            next_url=next_page_url(page, genre=genre),
+            first_url=url_for('artists', genre=genre),
+            genre=genre
+        )
+
+    @app.route('/artists/search', methods=['POST'])
+    def search_artists():
+        # implement search on artists with partial string search. Ensure it is case-insensitive.
+        # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+        # search for "band" should return "The Wild Sax Band".
+        search_term = request.form.get('search_term', None)
+        results = search_results(artist_search, search_term, 'artist_id')
+        response = {
+            "count": len(results),
+            "data": results
+        }
+        return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+    @app.route('/artists/<int:artist_id>')
+    @page_cache.cached('artist:{artist_id}')
+    def show_artist(artist_id):
+        # shows the Artist page with the given artist_id
+        # Step 5: replace with real Artist data from the Artists table, using artist_id
+        data = Artist.query.get_or_404(artist_id)
+        now = datetime.now()
+        refresh_show_counters([data], 'artist_id', now)
+        upcoming, past = shows_preview(Show.artist_id == artist_id, now)
+        data.upcoming_shows, data.past_shows = upcoming.items, past.items
+        data.upcoming_shows_url = upcoming.next_cursor and url_for(
+            'artist_shows', artist_id=artist_id, when='upcoming')
+        data.past_shows_url = past.next_cursor and url_for(
+            'artist_shows', artist_id=artist_id, when='past')
+        return render_template('pages/show_artist.html', artist=data)
+
+    @app.route('/artists/<int:artist_id>/shows')
+    @page_cache.cached('artist:{artist_id}')
+    def artist_shows(artist_id):
+        return owner_shows(Show.artist_id == artist_id,
+                           request.args.get('when', 'upcoming'), artist_id=artist_id)
+
+    #  Update
+    #  ----------------------------------------------------------------
+
+    @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+    def edit_artist(artist_id):
+        form = ArtistForm()
+        artist = Artist.query.get_or_404(artist_id)
+        return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+    @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+    def edit_artist_submission(artist_id):
+        artist = Artist.query.get_or_404(artist_id)
+
+        form = ArtistForm(formdata=request.form, obj=artist)
+        if form.validate_on_submit():
+            form.populate_obj(artist)
+            db.session.commit()
+            # shows and venue pages list the artist name and image
+            venue_ids = show_owner_ids(Show.venue_id, Show.artist_id == artist_id)
+            page_cache.invalidate('artists', 'shows', 'artist:{}'.format(artist_id),
+                                  *['venue:{}'.format(id) for id in venue_ids])
+
+        return redirect(url_for('show_artist', artist_id=artist_id))
+
+    @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+    def edit_venue(venue_id):
+        form = VenueForm()
         venue = Venue.query.get_or_404(venue_id)
-        db.session.delete(venue)
-        db.session.commit()
-        flash('Venue ID ' + venue_id + ' deleted successfully.', 'info')
-        return Response(status=202)
-    except:
-        flash('An error occurred. Venue ID ' +
-              venue_id + ' could not be deleted.', 'error')
-        # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-        # clicking that button delete it from the db then redirect the user to the homepage
-    return Response(status=400)
-
-#  Artists
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists')
-def artists():
-    # Step 3: replace with real data returned from querying the database
-    data = Artist.query.with_entities(Artist.id, Artist.name).all()
-    return render_template('pages/artists.html', artists=data)
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    # implement search on artists with partial string search. Ensure it is case-insensitive.
-    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-    # search for "band" should return "The Wild Sax Band".
-    results = []
-    search_term = request.form.get('search_term', None)
-    if search_term:
-        results = Artist.query.join(Artist.shows).with_entities(
-            Artist.id,
-            Artist.name,
-            func.count(Show.id).label("num_upcoming_shows")
-        ).filter(Artist.name.ilike(search_term))\
-            .group_by(Artist.id, Artist.name).all()
-    response = {
-        "count": len(results),
-        "data": results
-    }
-    return render_template('pages/search_artists.html', results=response, search_term=search_term)
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    # shows the Artist page with the given artist_id
-    # Step 5: replace with real Artist data from the Artists table, using artist_id
-    data = Artist.query.get_or_404(artist_id)
-    print(type(data.genres))
-    data.genres = data.genres.split(",")
-    shows = Show.query.filter(Show.artist_id == artist_id).all()
-    upcoming_shows = list(
-        filter(lambda show: show.start_time >= datetime.now(), shows))
-    past_shows = list(
-        filter(lambda show: show.start_time < datetime.now(), shows))
-    data.upcoming_shows = upcoming_shows
-    data.past_shows = past_shows
-    data.upcoming_shows_count = len(upcoming_shows)
-    data.past_shows_count = len(past_shows)
-    return render_template('pages/show_artist.html', artist=data)
-
-#  Update
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    form = ArtistForm()
-    artist = Artist.query.get_or_404(artist_id)
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
-
-    form = ArtistForm(formdata=request.form, obj=artist)
-    if form.validate_on_submit():
-        form.populate_obj(artist)
-        db.session.commit()
-
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    form = VenueForm()
-    venue = Venue.query.get_or_404(venue_id)
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
-
-    form = VenueForm(formdata=request.form, obj=venue)
-    if form.validate_on_submit():
-        form.populate_obj(venue)
-        db.session.commit()
-    return redirect(url_for('show_venue', venue_id=venue_id))
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
+        return render_template('forms/edit_venue.html', form=form, venue=venue)
 
+    @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+    def edit_venue_submission(venue_id):
+        venue = Venue.query.get_or_404(venue_id)
 
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    form = None
-    try:
-        artist = Artist()
+        form = VenueForm(formdata=request.form, obj=venue)
+        if form.validate_on_submit():
+            form.populate_obj(venue)
+            db.session.commit()
+            # shows and artist pages list the venue name
+            artist_ids = show_owner_ids(Show.artist_id, Show.venue_id == venue_id)
+            page_cache.invalidate('venues', 'shows', 'venue:{}'.format(venue_id),
+                                  *['artist:{}'.format(id) for id in artist_ids])
+        return redirect(url_for('show_venue', venue_id=venue_id))
+
+    #  Create Artist
+    #  ----------------------------------------------------------------
+
+    @app.route('/artists/create', methods=['GET'])
+    def create_artist_form():
         form = ArtistForm()
-        # make sure form is valid
-        # if not, raise an error
-        assert(form.validate_on_submit())
-        form.populate_obj(artist)
-        artist.genres = ",".join(request.form.getlist("genres"))
-        db.session.add(artist)
-        db.session.commit()
-        # on successful db insert, flash success
-        flash('Artist ' + request.form['name'] + ' was successfully listed!')
-    except Exception as err:
-        print(err, form.errors)
-        # In case of Database error or form validation error
-        # alert the user and return the same form data
-        flash('An error occurred. Artist ' +
-              request.form['name'] + ' could not be listed.', 'error')
         return render_template('forms/new_artist.html', form=form)
-    return render_template('pages/home.html')
 
-
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-    # displays list of shows at /shows
-    data = Show.query.all()
-    return render_template('pages/shows.html', shows=data)
-
-
-@app.route('/shows/create')
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    form = None
-    try:
-        show = Show()
+    @app.route('/artists/create', methods=['POST'])
+    def create_artist_submission():
+        form = None
+        try:
+            artist = Artist()
+            form = ArtistForm()
+            # make sure form is valid
+            # if not, raise an error
+            assert(form.validate_on_submit())
+            form.populate_obj(artist)
+            db.session.add(artist)
+            db.session.commit()
+            page_cache.invalidate('artists')
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        except Exception as err:
+            print(err, form.errors)
+            # In case of Database error or form validation error
+            # alert the user and return the same form data
+            flash('An error occurred. Artist ' +
+                  request.form['name'] + ' could not be listed.', 'error')
+            return render_template('forms/new_artist.html', form=form)
+        return render_template('pages/home.html')
+
+    #  Shows
+    #  ----------------------------------------------------------------
+
+    @app.route('/shows')
+    @page_cache.cached('shows')
+    def shows():
+        # displays list of shows at /shows
+        page = paginate(Show.query, Show, SHOWS_ORDER)
+        if wants_json():
+            return jsonify(
+                shows=[show_to_dict(show) for show in page.items],
+                next_cursor=page.next_cursor
+            )
+        return render_template(
+            'pages/shows.html',
+            shows=page.items,
+            next_url=next_page_url(page),
+            first_url=url_for('shows')
+        )
+
+    @app.route('/shows/create')
+    def create_shows():
+        # renders form. do not touch.
         form = ShowForm()
-        # make sure form is valid
-        # if not, raise an error
-        assert(form.validate_on_submit())
-        form.populate_obj(show)
-        db.session.add(show)
-        db.session.commit()
-        # on successful db insert, flash success
-        flash('Show was successfully listed!')
-    except:
-        # In case of Database error or form validation error
-        # alert the user and return the same form data
-        flash('An error occurred. Show could not be listed.', 'error')
         return render_template('forms/new_show.html', form=form)
-    return render_template('pages/home.html')
 
+    @app.route('/shows/create', methods=['POST'])
+    def create_show_submission():
+        form = None
+        try:
+            show = Show()
+            form = ShowForm()
+            # make sure form is valid
+            # if not, raise an error
+            assert(form.validate_on_submit())
+            form.populate_obj(show)
+            db.session.add(show)
+            db.session.commit()
+            page_cache.invalidate('shows', 'venues',
+                                  'venue:{}'.format(show.venue_id),
+                                  'artist:{}'.format(show.artist_id))
+            # on successful db insert, flash success
+            flash('Show was successfully listed!')
+        except:
+            # In case of Database error or form validation error
+            # alert the user and return the same form data
+            flash('An error occurred. Show could not be listed.', 'error')
+            return render_template('forms/new_show.html', form=form)
+        return render_template('pages/home.html')
+
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return render_template('errors/404.html'), 404
+
+    @app.errorhandler(500)
+    def server_error(error):
+        return render_template('errors/500.html'), 500
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter(
+                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
 
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
+#----------------------------------------------------------------------------#
+# Warmup.
+#----------------------------------------------------------------------------#
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# Hooks for preforking servers, see gunicorn.conf.py. `warmup()` runs once in
+# the master before the workers are forked, so the work it does is shared
+# copy-on-write by every worker instead of being repeated on each first
+# request. Database connections can't be shared across a fork, each worker
+# opens its own with `connect_pool()`.
+
+
+def warmup(app):
+    # Compiles every template into the Jinja cache
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    warmup_filters()
+    with app.app_context():
+        # Fails fast on a wrong DATABASE_URL, then closes the connection so
+        # the forked workers don't inherit its socket
+        db.session.execute(select([1]))
+        db.session.remove()
+        db.engine.dispose()
+
+
+def connect_pool(app):
+    # Opens the pool connections of a freshly forked worker up front
+    with app.app_context():
+        engine = db.engine
+        engine.dispose()
+        # SQLite pools don't keep connections
+        size = engine.pool.size() if hasattr(engine.pool, 'size') else 0
+        connections = [engine.connect() for _ in range(size)]
+        for connection in connections:
+            connection.close()
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -470,11 +587,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request, session
+
+
+class LRUBackend(object):
+    '''
+    In-process cache, keeps the `max_entries` most recently used entries.
+    Entries are private to the process, invalidations done by one worker
+    are not seen by the others (use `FileBackend` for that).
+    '''
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class FileBackend(object):
+    '''
+    Cache stored as one pickle file per entry in `directory`, shared by
+    every worker of the host. Expired files are deleted when read, and
+    every `sweep_interval` seconds a write sweeps the directory: expired
+    entries (pages of old tag versions expire like the others) and
+    abandoned temporary files are deleted, then the oldest entries until
+    at most `max_entries` are left.
+    '''
+    TEMP_PREFIX = '.tmp'
+
+    def __init__(self, directory, max_entries=1000, sweep_interval=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.time() + sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def expired(expires, now):
+        # anything but a timestamp or None comes from an older file format
+        if expires is None:
+            return False
+        return not isinstance(expires, float) or expires < now
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                # the expiry is pickled first, the sweep reads nothing else
+                if not self.expired(pickle.load(file), time.time()):
+                    return pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        self.remove(path)
+        return None
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else None
+        # written aside then renamed so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=self.TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(expires, file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            self.remove(temp_path)
+            raise
+        if time.time() >= self.next_sweep:
+            self.sweep()
+
+    def delete(self, key):
+        self.remove(self.path(key))
+
+    def sweep(self):
+        now = time.time()
+        self.next_sweep = now + self.sweep_interval
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                modified = entry.stat().st_mtime
+                if entry.name.startswith(self.TEMP_PREFIX):
+                    # left behind by a killed writer
+                    if modified < now - self.sweep_interval:
+                        self.remove(entry.path)
+                    continue
+                with open(entry.path, 'rb') as file:
+                    expires = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            if self.expired(expires, now):
+                self.remove(entry.path)
+            else:
+                entries.append((modified, entry.path))
+        entries.sort()
+        for modified, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            self.remove(path)
+
+
+class PageCache(object):
+    '''
+    Caches rendered pages keyed by path, query string and the versions of
+    their tags ("venues", "venue:1"...).
+    Invalidating a tag gives it a new version so every page tagged with it
+    is rendered again on its next request, entries of the old version
+    simply expire.
+    Cached pages carry an ETag, repeat visitors sending `If-None-Match`
+    get a 304 without the view being called.
+    '''
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1000))
+        elif backend == 'file':
+            self.backend = FileBackend(app.config['CACHE_DIR'],
+                                       app.config.get('CACHE_MAX_ENTRIES', 1000),
+                                       app.config.get('CACHE_SWEEP_INTERVAL', 300))
+        elif backend is not None:
+            raise ValueError('Unknown CACHE_BACKEND ' + repr(backend))
+        self.timeout = app.config.get('CACHE_TIMEOUT', 300)
+
+    def tag_version(self, tag):
+        version = self.backend.get('tag:' + tag)
+        if version is None:
+            # never 0, an evicted version must not match older entries
+            version = self.new_version(tag)
+        return version
+
+    def new_version(self, tag):
+        version = uuid.uuid4().hex
+        self.backend.set('tag:' + tag, version)
+        return version
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.new_version(tag)
+
+    def page_key(self, tags):
+        versions = ','.join(tag + '=' + self.tag_version(tag) for tag in tags)
+        query = '&'.join(sorted(request.query_string.decode('utf-8').split('&')))
+        return 'page:{}?{}|{}|{}'.format(
+            request.path, query, request.accept_mimetypes.best, versions)
+
+    def cached(self, *tags):
+        '''
+        Caches the view, `tags` are formatted with the view arguments:
+            @page_cache.cached('venues', 'venue:{venue_id}')
+        '''
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pending flash messages are rendered into the page
+                if self.backend is None or request.method != 'GET' or '_flashes' in session:
+                    return view(**kwargs)
+                key = self.page_key([tag.format(**kwargs) for tag in tags])
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(view(**kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    body = response.get_data()
+                    entry = (hashlib.sha1(body).hexdigest(), body, response.mimetype)
+                    self.backend.set(key, entry, self.timeout)
+                etag, body, mimetype = entry
+                response = current_app.response_class(body, mimetype=mimetype)
+                response.set_etag(etag)
+                # browsers revalidate on every visit, a 304 costs no query
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
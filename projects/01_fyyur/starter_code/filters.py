@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# babel and dateutil are imported on first use, they weigh more than the
+# rest of the app at startup. Preforking servers call `warmup_filters()`
+# so the workers share them already loaded.
+
+# Named formats accepted by the `datetime` filter
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+# Formatted values kept by `format_datetime`
+FORMATTED_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    # Parsing the pattern and the locale data is the costly part of babel
+    # formatting, both only depend on (format, locale)
+    import babel.dates
+    pattern = DATETIME_FORMATS.get(format, format)
+    return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+
+def default_locale():
+    import babel.dates
+    return babel.dates.LC_TIME
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+
+def apply_pattern(pattern, locale, value):
+    # babel treats naive datetimes as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return pattern.apply(value, locale)
+
+
+@lru_cache(maxsize=FORMATTED_CACHE_SIZE)
+def format_datetime_cached(value, format, locale):
+    pattern, locale = compiled_pattern(format, locale)
+    return apply_pattern(pattern, locale, value)
+
+
+def format_datetime(value, format='medium', locale=None):
+    # datetime objects are formatted directly, strings are parsed first
+    if value is None:
+        return ''
+    return format_datetime_cached(
+        to_datetime(value), format, locale or default_locale())
+
+
+def format_show_times(shows, format='medium', locale=None):
+    '''
+    Pairs every show with its formatted `start_time` in a single pass,
+    the pattern and locale are resolved once for the whole list.
+    Usage in list templates:
+        {% for show, start_time in shows|with_start_times('full') %}
+    '''
+    pattern, locale = compiled_pattern(format, locale or default_locale())
+    formatted = {}
+    pairs = []
+    for show in shows:
+        value = show.start_time
+        if value not in formatted:
+            formatted[value] = '' if value is None else apply_pattern(
+                pattern, locale, to_datetime(value))
+        pairs.append((show, formatted[value]))
+    return pairs
+
+
+def register_filters(jinja_env):
+    jinja_env.filters['datetime'] = format_datetime
+    jinja_env.filters['with_start_times'] = format_show_times
+
+
+def warmup_filters():
+    import dateutil.parser  # noqa: F401
+    for format in DATETIME_FORMATS:
+        compiled_pattern(format, default_locale())
@@ -0,0 +1,20 @@
+# gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app("production")'
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# The app is built once in the master and forked, workers start warm and
+# share its memory copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    from app import warmup
+    warmup(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    from app import connect_pool
+    connect_pool(server.app.wsgi())
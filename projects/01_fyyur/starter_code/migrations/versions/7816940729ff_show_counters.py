@@ -0,0 +1,70 @@
+"""Materialized show counters for venues and artists.
+
+Revision ID: 7816940729ff
+Revises: 9fe8447476f4
+Create Date: 2026-10-18 10:12:41.503118
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7816940729ff'
+down_revision = '9fe8447476f4'
+branch_labels = None
+depends_on = None
+
+show = sa.table(
+    'Show',
+    sa.column('id', sa.Integer),
+    sa.column('venue_id', sa.Integer),
+    sa.column('artist_id', sa.Integer),
+    sa.column('start_time', sa.DateTime),
+)
+
+
+def owner_table(name):
+    return sa.table(
+        name,
+        sa.column('id', sa.Integer),
+        sa.column('upcoming_shows_count', sa.Integer),
+        sa.column('past_shows_count', sa.Integer),
+        sa.column('next_show_time', sa.DateTime),
+    )
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        op.create_index(op.f('ix_{}_next_show_time'.format(table)), table, ['next_show_time'], unique=False)
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+
+    # Backfill the counters of existing rows
+    now = datetime.now()
+    for table, show_fk in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        owners = owner_table(table)
+
+        def owner_shows(column, condition):
+            return sa.select([column]).where(sa.and_(
+                show.c[show_fk] == owners.c.id, condition)).as_scalar()
+
+        op.execute(owners.update().values(
+            upcoming_shows_count=owner_shows(sa.func.count(show.c.id), show.c.start_time >= now),
+            past_shows_count=owner_shows(sa.func.count(show.c.id), show.c.start_time < now),
+            next_show_time=owner_shows(sa.func.min(show.c.start_time), show.c.start_time >= now),
+        ))
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    for table in ('Artist', 'Venue'):
+        op.drop_index(op.f('ix_{}_next_show_time'.format(table)), table_name=table)
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,40 @@
+"""Trigram and full-text search indexes on venue and artist names.
+
+Revision ID: 85e83520195c
+Revises: c85e09045e91
+Create Date: 2026-10-18 11:47:52.091344
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '85e83520195c'
+down_revision = 'c85e09045e91'
+branch_labels = None
+depends_on = None
+
+# Other databases are searched through an in-process index (see search.py)
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in TABLES:
+        # ILIKE '%term%' and similarity() ranking
+        op.execute('CREATE INDEX "ix_{0}_name_trgm" ON "{0}" '
+                   'USING gin (name gin_trgm_ops)'.format(table))
+        # whole words in any order, the expression must match search.py
+        op.execute('CREATE INDEX "ix_{0}_name_tsv" ON "{0}" '
+                   'USING gin (to_tsvector(\'simple\', coalesce(name, \'\')))'.format(table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_tsv"'.format(table))
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_trgm"'.format(table))
@@ -0,0 +1,26 @@
+"""Indexes for keyset pagination of shows and artists.
+
+Revision ID: c85e09045e91
+Revises: 7816940729ff
+Create Date: 2026-10-18 11:02:17.264810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c85e09045e91'
+down_revision = '7816940729ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
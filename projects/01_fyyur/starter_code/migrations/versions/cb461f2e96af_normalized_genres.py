@@ -0,0 +1,81 @@
+"""Normalized genre storage for venues and artists.
+
+Revision ID: cb461f2e96af
+Revises: 85e83520195c
+Create Date: 2026-10-18 12:35:06.718230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cb461f2e96af'
+down_revision = '85e83520195c'
+branch_labels = None
+depends_on = None
+
+# Genre choices of forms.py at the time of this migration
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+    'Soul', 'Other',
+]
+
+genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+artist = sa.table('Artist', sa.column('id', sa.Integer), sa.column('genres', sa.String))
+artist_genres = sa.table('artist_genres', sa.column('artist_id', sa.Integer), sa.column('genre_id', sa.Integer))
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, owner in (('venue_genres', 'Venue'), ('artist_genres', 'Artist')):
+        owner_id = owner.lower() + '_id'
+        op.create_table(table,
+        sa.Column(owner_id, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([owner_id], [owner + '.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(owner_id, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(table, owner_id), table, ['genre_id', owner_id], unique=False)
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+
+    # Convert the comma joined `Artist.genres` strings
+    connection = op.get_bind()
+    artist_names = {}
+    for artist_id, names in connection.execute(sa.select([artist.c.id, artist.c.genres])):
+        artist_names[artist_id] = [name for name in dict.fromkeys(
+            n.strip() for n in (names or '').split(',')) if name]
+    unknown = {name for names in artist_names.values() for name in names} - set(GENRES)
+    if unknown:
+        op.bulk_insert(genre, [{'name': name} for name in sorted(unknown)])
+    genre_ids = {name: id for id, name in connection.execute(sa.select([genre.c.id, genre.c.name]))}
+    links = [{'artist_id': artist_id, 'genre_id': genre_ids[name]}
+             for artist_id, names in artist_names.items() for name in names]
+    if links:
+        op.bulk_insert(artist_genres, links)
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    connection = op.get_bind()
+    names = {}
+    rows = connection.execute(sa.select([artist_genres.c.artist_id, genre.c.name]).select_from(
+        artist_genres.join(genre, artist_genres.c.genre_id == genre.c.id)).order_by(genre.c.id))
+    for artist_id, name in rows:
+        names.setdefault(artist_id, []).append(name)
+    for artist_id, genres in names.items():
+        connection.execute(artist.update().where(artist.c.id == artist_id).values(genres=','.join(genres)))
+    op.drop_index('ix_artist_genres_genre_id_artist_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id_venue_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('Genre')
@@ -0,0 +1,437 @@
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, case, and_, or_, select, event, inspect
+from search import Search
+
+# Bound to the application by `create_app()`
+db = SQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def lookup(cls, names):
+        # Genre rows of `names`, in order, creating the unknown ones
+        names = list(dict.fromkeys(names or []))
+        if not names:
+            return []
+        genres = {genre.name: genre for genre in
+                  cls.query.filter(cls.name.in_(names))}
+        return [genres.get(name) or cls(name=name) for name in names]
+
+
+# Genre associations, the (genre_id, owner id) indexes serve the
+# "by genre" listings while the primary keys serve detail pages
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    # Show counters, maintained by the listeners in the `Show counters` section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+    shows = db.relationship("Show", backref="venue", cascade="all,delete")
+    genre_rows = db.relationship("Genre", secondary=venue_genres, order_by=Genre.id)
+
+    # Genre names, as used by `VenueForm` and the templates
+    @property
+    def genres(self):
+        return [genre.name for genre in self.genre_rows]
+
+    @genres.setter
+    def genres(self, names):
+        self.genre_rows = Genre.lookup(names)
+
+    """
+    {
+        "city": "San Francisco",
+        "state": "CA",
+        "venues": [{
+            "id": 1,
+            "name": "The Musical Hop",
+            "num_upcoming_shows": 0,
+        }, {
+            "id": 3,
+            "name": "Park Square Live Music & Coffee",
+            "num_upcoming_shows": 1,
+        }]
+    }
+    """
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        # Keyset pagination of the artists listing
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(500))
+    # Show counters, maintained by the listeners in the `Show counters` section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+    shows = db.relationship("Show", backref="artist", cascade="delete,all")
+    genre_rows = db.relationship("Genre", secondary=artist_genres, order_by=Genre.id)
+
+    # Genre names, as used by `ArtistForm` and the templates
+    @property
+    def genres(self):
+        return [genre.name for genre in self.genre_rows]
+
+    @genres.setter
+    def genres(self, names):
+        self.genre_rows = Genre.lookup(names)
+
+    # Step 2: implement any missing fields, as a database migration using Flask-Migrate
+
+    """
+    {
+        "id": 1,
+        "name": "The Musical Hop",
+        "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+        "address": "1015 Folsom Street",
+        "city": "San Francisco",
+        "state": "CA",
+        "phone": "123-123-1234",
+        "website": "https://www.themusicalhop.com",
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+        "seeking_talent": True,
+        "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+        "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
+        "past_shows": [{
+            "artist_id": 4,
+            "artist_name": "Guns N Petals",
+            "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+            "start_time": "2019-05-21T21:30:00.000Z"
+        }],
+        "upcoming_shows": [],
+        "past_shows_count": 1,
+        "upcoming_shows_count": 0,
+    }
+    """
+
+
+# Step 1: Implement Show and Artist models,
+# and complete all model relationships and properties,
+# as a database migration.
+# (Making it easier to figuer out relations and properties with other models)
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # Range scans over the shows of a single venue/artist
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Keyset pagination of the shows listing
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    venue_name = db.Column(db.String(120))
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ))
+    artist_name = db.Column(db.String(120))
+    artist_image_link = db.Column(db.String)
+    start_time = db.Column(db.DateTime)
+
+    """
+    {
+        "venue_id": 1,
+        "venue_name": "The Musical Hop",
+        "artist_id": 4,
+        "artist_name": "Guns N Petals",
+        "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
+        "start_time": "2019-05-21T21:30:00.000Z"
+    }
+    """
+venue_search = Search(db, Venue)
+artist_search = Search(db, Artist)
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venues and artists keep their upcoming/past show counts materialized so
+# detail pages never have to load their whole show list.
+# Counters are updated incrementally whenever a show is inserted or deleted,
+# shows that started since `next_show_time` are moved from upcoming to past
+# by `roll_show_counters()` (run on read and by `flask roll-show-counters`).
+
+SHOW_COUNTER_OWNERS = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+
+def next_show_time_query(owners, show_fk, now):
+    shows = Show.__table__
+    return select([func.min(shows.c.start_time)]).where(and_(
+        shows.c[show_fk] == owners.c.id,
+        shows.c.start_time >= now
+    )).as_scalar()
+
+
+def roll_show_counters(connection, model, show_fk, now, owner_ids=None):
+    # Only the shows between `next_show_time` and `now` are counted,
+    # so the cost depends on the shows that moved and not on the total
+    shows = Show.__table__
+    owners = model.__table__
+    moved_shows = select([func.count(shows.c.id)]).where(and_(
+        shows.c[show_fk] == owners.c.id,
+        shows.c.start_time >= owners.c.next_show_time,
+        shows.c.start_time < now
+    )).as_scalar()
+    statement = owners.update().where(owners.c.next_show_time < now).values(
+        upcoming_shows_count=owners.c.upcoming_shows_count - moved_shows,
+        past_shows_count=owners.c.past_shows_count + moved_shows,
+        next_show_time=next_show_time_query(owners, show_fk, now)
+    )
+    if owner_ids is not None:
+        statement = statement.where(owners.c.id.in_(owner_ids))
+    return connection.execute(statement).rowcount
+
+
+def rebuild_show_counters(connection, model, show_fk, now):
+    # Full recount, used to repair counters
+    shows = Show.__table__
+    owners = model.__table__
+
+    def count_shows(condition):
+        return select([func.count(shows.c.id)]).where(and_(
+            shows.c[show_fk] == owners.c.id, condition)).as_scalar()
+
+    return connection.execute(owners.update().values(
+        upcoming_shows_count=count_shows(shows.c.start_time >= now),
+        past_shows_count=count_shows(shows.c.start_time < now),
+        next_show_time=next_show_time_query(owners, show_fk, now)
+    )).rowcount
+
+
+def refresh_show_counters(entities, show_fk, now):
+    # Makes sure counters read from `entities` (of one model) are up to
+    # date at `now`. Stale ones are rolled in a single statement and
+    # transaction, then all of them are reloaded with a single query.
+    ids = [entity.id for entity in entities]
+    stale_ids = [entity.id for entity in entities
+                 if entity.next_show_time is not None
+                 and entity.next_show_time < now]
+    if not stale_ids:
+        return
+    model = type(entities[0])
+    roll_show_counters(db.session.connection(), model, show_fk, now, stale_ids)
+    db.session.commit()
+    model.query.filter(model.id.in_(ids)).all()
+
+
+def update_show_counters(connection, show, delta):
+    now = datetime.now()
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        owner_id = getattr(show, show_fk)
+        if owner_id is None or show.start_time is None:
+            continue
+        owners = model.__table__
+        if show.start_time < now:
+            values = {
+                "past_shows_count": owners.c.past_shows_count + delta
+            }
+        elif delta > 0:
+            values = {
+                "upcoming_shows_count": owners.c.upcoming_shows_count + delta,
+                "next_show_time": case([(or_(
+                    owners.c.next_show_time.is_(None),
+                    owners.c.next_show_time > show.start_time
+                ), show.start_time)], else_=owners.c.next_show_time)
+            }
+        else:
+            # The show row is already deleted, so the nearest upcoming
+            # show is picked from the remaining ones
+            values = {
+                "upcoming_shows_count": owners.c.upcoming_shows_count + delta,
+                "next_show_time": next_show_time_query(owners, show_fk, now)
+            }
+        connection.execute(owners.update().where(
+            owners.c.id == owner_id).values(**values))
+
+
+@event.listens_for(Show, 'before_insert')
+@event.listens_for(Show, 'before_delete')
+def roll_show_owners(mapper, connection, show):
+    # Counters must be rolled to `now` before they are adjusted, otherwise
+    # a past show would be counted again by the next roll
+    now = datetime.now()
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        owner_id = getattr(show, show_fk)
+        if owner_id is not None:
+            roll_show_counters(connection, model, show_fk, now, [owner_id])
+
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+    update_show_counters(connection, show, 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, show):
+    update_show_counters(connection, show, -1)
+
+
+@click.command('roll-show-counters')
+@with_appcontext
+def roll_show_counters_command():
+    """Moves started shows from upcoming to past counters, run it from cron."""
+    now = datetime.now()
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        rolled = roll_show_counters(
+            db.session.connection(), model, show_fk, now)
+        print(f"{model.__tablename__}: {rolled} rolled forward")
+    db.session.commit()
+
+
+@click.command('rebuild-show-counters')
+@with_appcontext
+def rebuild_show_counters_command():
+    """Recounts upcoming and past shows of every venue and artist."""
+    now = datetime.now()
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        rebuilt = rebuild_show_counters(
+            db.session.connection(), model, show_fk, now)
+        print(f"{model.__tablename__}: {rebuilt} rebuilt")
+    db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Show copies.
+#----------------------------------------------------------------------------#
+
+# Shows keep copies of some venue and artist fields so show lists render
+# without joins. Copies are filled when a show is inserted and propagated
+# with a single set-based UPDATE whenever the source fields change,
+# `flask sync-show-copies` reconciles all shows batch by batch.
+
+# (show column, source model, source column)
+SHOW_COPIES = (
+    ('venue_name', Venue, 'name'),
+    ('artist_name', Artist, 'name'),
+    ('artist_image_link', Artist, 'image_link'),
+)
+# Shows checked per statement (and transaction) by `flask sync-show-copies`
+SHOW_COPIES_BATCH_SIZE = 10000
+
+
+def show_copies(model):
+    return [(show_column, owner_column) for show_column, owner, owner_column
+            in SHOW_COPIES if owner is model]
+
+
+def sync_show_copies(connection, model, show_fk, owner_ids=None, show_ids=None):
+    # Updates the shows whose copies differ from their `model` row,
+    # optionally limited to some owners or to a (first, last) show id range
+    shows = Show.__table__
+    owners = model.__table__
+    copies = show_copies(model)
+    if connection.dialect.name == 'postgresql':
+        # UPDATE "Show" ... FROM "Venue" WHERE ...
+        statement = shows.update().values({
+            show_column: owners.c[owner_column] for show_column, owner_column in copies
+        }).where(and_(
+            shows.c[show_fk] == owners.c.id,
+            or_(*[shows.c[show_column].is_distinct_from(owners.c[owner_column])
+                  for show_column, owner_column in copies])
+        ))
+    else:
+        def owner_value(owner_column):
+            return select([owners.c[owner_column]]).where(
+                owners.c.id == shows.c[show_fk]).as_scalar()
+        statement = shows.update().values({
+            show_column: owner_value(owner_column) for show_column, owner_column in copies
+        }).where(and_(
+            shows.c[show_fk].isnot(None),
+            or_(*[shows.c[show_column].is_distinct_from(owner_value(owner_column))
+                  for show_column, owner_column in copies])
+        ))
+    if owner_ids is not None:
+        statement = statement.where(shows.c[show_fk].in_(owner_ids))
+    if show_ids is not None:
+        statement = statement.where(shows.c.id.between(*show_ids))
+    return connection.execute(statement).rowcount
+
+
+@event.listens_for(Show, 'before_insert')
+def copy_owner_fields(mapper, connection, show):
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        owners = model.__table__
+        copies = show_copies(model)
+        owner_id = getattr(show, show_fk)
+        row = None
+        if owner_id is not None:
+            row = connection.execute(select(
+                [owners.c[owner_column] for show_column, owner_column in copies]
+            ).where(owners.c.id == owner_id)).first()
+        for show_column, owner_column in copies:
+            setattr(show, show_column, row[owner_column] if row else None)
+
+
+@event.listens_for(Venue, 'after_update')
+@event.listens_for(Artist, 'after_update')
+def propagate_owner_fields(mapper, connection, owner):
+    state = inspect(owner)
+    if any(state.attrs[owner_column].history.has_changes()
+           for show_column, owner_column in show_copies(type(owner))):
+        show_fk = dict(SHOW_COUNTER_OWNERS)[type(owner)]
+        sync_show_copies(connection, type(owner), show_fk, owner_ids=[owner.id])
+
+
+@click.command('sync-show-copies')
+@with_appcontext
+def sync_show_copies_command():
+    """Reconciles the venue and artist fields copied into shows."""
+    last_id = db.session.query(func.max(Show.id)).scalar() or 0
+    for model, show_fk in SHOW_COUNTER_OWNERS:
+        updated = 0
+        for first_id in range(0, last_id + 1, SHOW_COPIES_BATCH_SIZE):
+            updated += sync_show_copies(
+                db.session.connection(), model, show_fk,
+                show_ids=(first_id, first_id + SHOW_COPIES_BATCH_SIZE - 1))
+            db.session.commit()
+        print(f"{model.__tablename__}: {updated} shows updated")
@@ -0,0 +1,112 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.sql.functions import coalesce
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# `items` of the current page and the cursor of the following one,
+# `next_cursor` is None on the last page
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    # Opaque, url safe token holding the sort key of the last row of a page
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    token = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+        assert isinstance(values, list) and len(values) == len(columns)
+        return [
+            datetime.fromisoformat(value)
+            if isinstance(column.type, DateTime) and value is not None
+            else value
+            for column, value in zip(columns, values)
+        ]
+    except (AssertionError, TypeError, ValueError, binascii.Error):
+        raise InvalidCursor(token)
+
+
+def page_size(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def nullable(column):
+    # read on the column itself, ordered expressions don't carry it. A
+    # (labeled) COALESCE is taken to end with a default that isn't NULL
+    if isinstance(getattr(column, 'element', column), coalesce):
+        return False
+    return getattr(column, 'nullable', True)
+
+
+def seek(query, columns, after, descending=False):
+    # `query` ordered by `columns`, from the row following the `after`
+    # values. The row value comparison lets the database seek in an index
+    # of `columns`
+    if after is not None:
+        key, values = tuple_(*columns), tuple_(*after)
+        query = query.filter(key < values if descending else key > values)
+    order = [column.desc() for column in columns] if descending else columns
+    return query.order_by(*order)
+
+
+def segments(query, columns, after, descending=False):
+    # (query, columns, after) of the parts of `query` paged one after the
+    # other. A NULL compares to nothing, so when the leading column is
+    # nullable its NULL rows are paged apart by the following columns:
+    # after the others, or before them when `descending`
+    leading = columns[0]
+    if not nullable(leading) or len(columns) == 1:
+        return [(query, columns, after)]
+    keyed = [query.filter(leading.isnot(None)), columns, None]
+    nulls = [query.filter(leading.is_(None)), columns[1:], None]
+    parts = [nulls, keyed] if descending else [keyed, nulls]
+    # the part holding the cursor starts after it, the ones before it are done
+    if after is not None and after[0] is None:
+        nulls[2] = after[1:]
+        if not descending:
+            parts = [nulls]
+    elif after is not None:
+        keyed[2] = after
+        if descending:
+            parts = [keyed]
+    return parts
+
+
+def paginate_keyset(query, columns, after=None, limit=None, descending=False):
+    '''
+    Returns the rows of `query` that follow the `after` cursor, ordered by
+    `columns` which must end with a unique column (usually the primary key)
+    and may start with a nullable one, whose NULLs come last (first when
+    `descending`). Rows are located through a row value comparison on the
+    sort key, so every page costs the same as the first one when `columns`
+    is indexed.
+    '''
+    limit = page_size(limit)
+    values = decode_cursor(after, columns) if after else None
+    rows = []
+    # one extra row tells whether there is a following page
+    for part, part_columns, part_after in segments(query, columns, values, descending):
+        rows.extend(seek(part, part_columns, part_after, descending)
+                    .limit(limit + 1 - len(rows)).all())
+        if len(rows) > limit:
+            break
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor([getattr(rows[-1], column.key) for column in columns]))
@@ -0,0 +1,167 @@
+import heapq
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import event, func, or_, select
+
+SEARCH_RESULTS_LIMIT = 20
+NGRAM_SIZE = 3
+# Matches fetched through the GIN indexes before similarity() ranks them
+SEARCH_CANDIDATES = 200
+# Rows fetched per round trip while building an in-process index
+INDEX_FETCH_SIZE = 1000
+# Text search configuration, must match the expression indexed by the
+# `search indexes` migration for Postgres to use the index
+TSVECTOR_CONFIG = 'simple'
+
+
+def escape_like(term):
+    return re.sub(r'([\\%_])', r'\\\1', term)
+
+
+def ngrams(word, n=NGRAM_SIZE):
+    return {word[i:i + n] for i in range(len(word) - n + 1)}
+
+
+def indexed_grams(text, n=NGRAM_SIZE):
+    # shorter grams are indexed as well so one and two letter terms
+    # are answered from the index too
+    grams = set()
+    for size in range(1, n + 1):
+        grams.update(ngrams(text, size))
+    return grams
+
+
+class NgramIndex(object):
+    '''
+    In-process n-gram index of short texts, used when the database has no
+    trigram support (SQLite during development).
+    Every n-gram (and shorter gram) points to the ids of the texts containing
+    it, a search intersects the posting sets of the term n-grams and only
+    verifies the remaining candidates.
+    '''
+
+    def __init__(self, n=NGRAM_SIZE):
+        self.n = n
+        self.texts = {}
+        self.postings = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, id, text):
+        text = (text or '').lower()
+        with self.lock:
+            self._discard(id)
+            self.texts[id] = text
+            for gram in indexed_grams(text, self.n):
+                self.postings[gram].add(id)
+
+    def discard(self, id):
+        with self.lock:
+            self._discard(id)
+
+    def _discard(self, id):
+        text = self.texts.pop(id, None)
+        if text is None:
+            return
+        for gram in indexed_grams(text, self.n):
+            ids = self.postings[gram]
+            ids.discard(id)
+            if not ids:
+                del self.postings[gram]
+
+    def search(self, term, limit=SEARCH_RESULTS_LIMIT):
+        term = term.lower().strip()
+        words = term.split()
+        if not words:
+            return []
+        with self.lock:
+            postings = [self.postings.get(gram, set()) for word in words
+                        for gram in ngrams(word, min(len(word), self.n))]
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            # words up to n letters are matched exactly by their posting set
+            words = [word for word in words if len(word) > self.n]
+            matches = [(id, self.texts[id]) for id in candidates
+                       if all(word in self.texts[id] for word in words)]
+        # whole term first, then prefixes, then the closest lengths
+        matches = heapq.nsmallest(limit, matches, key=lambda match: (
+            term not in match[1],
+            not match[1].startswith(term),
+            len(match[1]) - len(term),
+            match[0]
+        ))
+        return [id for id, text in matches]
+
+
+class Search(object):
+    '''
+    Ranked partial text search over one column of a model.
+
+    On Postgres the search runs in the database through the trigram and
+    tsvector GIN indexes, ranked by trigram similarity. Other databases use
+    an `NgramIndex` built on the first search and kept up to date by
+    listeners on the model.
+    '''
+
+    def __init__(self, db, model, column='name'):
+        self.db = db
+        self.model = model
+        self.column = getattr(model, column)
+        self.index = None
+        self.index_lock = threading.Lock()
+        event.listen(model, 'after_insert', self._indexed)
+        event.listen(model, 'after_update', self._indexed)
+        event.listen(model, 'after_delete', self._deleted)
+
+    def search(self, term, limit=SEARCH_RESULTS_LIMIT):
+        term = (term or '').strip()
+        if not term:
+            return []
+        if self.db.engine.dialect.name == 'postgresql':
+            return self._search_postgres(term, limit)
+        ids = self._get_index().search(term, limit)
+        rows = {row.id: row for row in
+                self.model.query.filter(self.model.id.in_(ids))} if ids else {}
+        # rows deleted by another process are still indexed here
+        return [rows[id] for id in ids if id in rows]
+
+    def _search_postgres(self, term, limit):
+        like = self.column.ilike('%' + escape_like(term) + '%', escape='\\')
+        if len(term) < NGRAM_SIZE:
+            # too short for a trigram, no index can answer it: walk the
+            # primary key and stop at the first matches instead of
+            # ranking every row containing the term
+            return self.model.query.filter(like) \
+                .order_by(self.model.id).limit(limit).all()
+        vector = func.to_tsvector(
+            TSVECTOR_CONFIG, func.coalesce(self.column, ''))
+        query = func.plainto_tsquery(TSVECTOR_CONFIG, term)
+        # only a bounded set of indexed matches is ranked, so common
+        # terms don't sort the whole table
+        candidates = select([self.model.id]).where(or_(
+            like, vector.op('@@')(query)
+        )).limit(SEARCH_CANDIDATES)
+        return self.model.query.filter(self.model.id.in_(candidates)) \
+            .order_by(
+                func.similarity(self.column, term).desc(),
+                self.model.id
+            ).limit(limit).all()
+
+    def _get_index(self):
+        with self.index_lock:
+            if self.index is None:
+                index = NgramIndex()
+                rows = self.model.query.with_entities(
+                    self.model.id, self.column).yield_per(INDEX_FETCH_SIZE)
+                for id, text in rows:
+                    index.add(id, text)
+                self.index = index
+            return self.index
+
+    def _indexed(self, mapper, connection, target):
+        if self.index is not None:
+            self.index.add(target.id, getattr(target, self.column.key))
+
+    def _deleted(self, mapper, connection, target):
+        if self.index is not None:
+            self.index.discard(target.id)
@@ -0,0 +1,118 @@
+import unittest
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import event, func
+
+from models import db, Artist, Show, Venue
+from pagination import paginate_keyset
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    """Pages through sort keys that contain NULLs"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def all_pages(self, query, columns, limit, descending=False):
+        rows, after = [], None
+        while True:
+            page = paginate_keyset(query, columns, after=after, limit=limit,
+                                   descending=descending)
+            rows.extend(page.items)
+            if page.next_cursor is None:
+                return rows
+            after = page.next_cursor
+
+    def test_null_names_are_paged_last(self):
+        for name in ('b', None, 'a', None, 'c', None):
+            db.session.add(Artist(name=name))
+        db.session.commit()
+
+        rows = self.all_pages(Artist.query, [Artist.name, Artist.id], limit=2)
+
+        self.assertEqual([(artist.name, artist.id) for artist in rows],
+                         [('a', 3), ('b', 1), ('c', 5),
+                          (None, 2), (None, 4), (None, 6)])
+
+    def test_null_start_times_are_paged_first_when_descending(self):
+        venue, artist = Venue(name='venue'), Artist(name='artist')
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        start = datetime(2026, 1, 1, 20, 0)
+        for start_time in (start, None, start + timedelta(days=1), None, start):
+            db.session.add(Show(venue_id=venue.id, artist_id=artist.id,
+                                start_time=start_time))
+        db.session.commit()
+
+        rows = self.all_pages(Show.query, [Show.start_time, Show.id],
+                              limit=1, descending=True)
+
+        self.assertEqual([(show.start_time, show.id) for show in rows],
+                         [(None, 4), (None, 2),
+                          (start + timedelta(days=1), 3),
+                          (start, 5), (start, 1)])
+
+    def test_coalesced_areas_are_paged_in_one_statement(self):
+        for city, state in (('SF', 'CA'), (None, 'CA'), ('SF', None),
+                            (None, None), ('NY', 'NY'), ('SF', 'CA')):
+            db.session.add(Venue(name='venue', city=city, state=state))
+        db.session.commit()
+        columns = [func.coalesce(Venue.city, '').label('city'),
+                   func.coalesce(Venue.state, '').label('state'), Venue.id]
+        query = Venue.query.with_entities(*columns)
+        statements = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        rows = self.all_pages(query, columns, limit=2)
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual([tuple(row) for row in rows],
+                         [('', '', 4), ('', 'CA', 2), ('NY', 'NY', 5),
+                          ('SF', '', 3), ('SF', 'CA', 1), ('SF', 'CA', 6)])
+        self.assertEqual(len(statements), 3)
+
+    def test_pages_seek_in_the_sort_index(self):
+        for number in range(30):
+            db.session.add(Artist(name=None if number % 3 == 0 else 'artist %02d' % number))
+        db.session.commit()
+        statements = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        columns = [Artist.name, Artist.id]
+        first = paginate_keyset(Artist.query, columns, limit=5)
+        paginate_keyset(Artist.query, columns, after=first.next_cursor, limit=5)
+        null_page = paginate_keyset(Artist.query, columns, limit=22)
+        paginate_keyset(Artist.query, columns, after=null_page.next_cursor, limit=5)
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+        # pages after a cursor, in the non NULL names then in the NULL ones
+        self.assertEqual(len(statements), 5)
+        for statement, parameters in (statements[1], statements[4]):
+            plan = ' '.join(row[-1] for row in db.engine.execute(
+                'EXPLAIN QUERY PLAN ' + statement, parameters))
+            self.assertIn('SEARCH', plan)
+            self.assertIn('ix_Artist_name_id', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,277 @@
+'''
+Load test of the trivia API endpoints.
+
+Seeds a synthetic question bank (see seed.py), then sends every scenario
+`--requests` times from `--workers` concurrent threads, through the Flask
+test client or an in-process threaded WSGI server (`--server`). Reports
+latency percentiles, throughput and SQL statements per request for each
+endpoint. Results can be saved as a baseline and later runs compared to
+it, the run fails when an endpoint got slower than the tolerance allows
+or runs more statements.
+
+    python -m benchmarks.load [--database-url URL [--reset]] [--questions N]
+        [--workers N] [--requests N] [--server]
+        [--save-baseline FILE] [--compare FILE] [--tolerance 0.25]
+
+Without --database-url a temporary SQLite database is seeded and used.
+The questions of a --database-url (postgresql://...) are used as they
+are, it is only seeded with --reset, which drops its tables.
+'''
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from flaskr import create_app, QUESTIONS_PER_PAGE
+from models import db, Question
+from benchmarks.seed import seed, CATEGORIES, WORDS
+
+PERCENTILES = (50, 90, 99)
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def questions_page(rng, total):
+    pages = max(total // QUESTIONS_PER_PAGE, 1)
+    return 'GET', '/questions?page={}'.format(rng.randint(1, pages)), None
+
+
+def category_page(rng, total):
+    return 'GET', '/categories/{}/questions?page={}'.format(
+        rng.randint(1, len(CATEGORIES)), rng.randint(1, 3)), None
+
+
+def search(rng, total):
+    # a word and the prefix of another one, like a user still typing
+    term = '{} {}'.format(rng.choice(WORDS), rng.choice(WORDS)[:3])
+    return 'POST', '/questions/search', {'searchTerm': term}
+
+
+def quiz(rng, total):
+    return 'POST', '/quizzes', {
+        'previous_questions': [rng.randint(1, max(total, 1)) for _ in range(5)],
+        'quiz_category': {'id': rng.randint(0, len(CATEGORIES))},
+    }
+
+
+SCENARIOS = {
+    'GET /questions': questions_page,
+    'GET /categories/<id>/questions': category_page,
+    'POST /questions/search': search,
+    'POST /quizzes': quiz,
+}
+
+
+def count_queries(app):
+    # Counts the statements of every request, returned in a header. A
+    # request is served by a single thread in both modes
+    counter = threading.local()
+
+    @event.listens_for(db.get_engine(app), 'before_cursor_execute')
+    def counted(conn, cursor, statement, parameters, context, executemany):
+        counter.count = getattr(counter, 'count', 0) + 1
+
+    @app.before_request
+    def reset_count():
+        counter.count = 0
+
+    @app.after_request
+    def report_count(response):
+        response.headers[QUERY_COUNT_HEADER] = str(getattr(counter, 'count', 0))
+        return response
+
+
+class ClientTransport(object):
+    # Requests through the Flask test client, one client per worker
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, method, url, body):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(url, method=method, json=body)
+        return response.status_code, response.headers.get(QUERY_COUNT_HEADER)
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerTransport(object):
+    # Requests over HTTP to a threaded WSGI server on a free local port
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def send(self, method, url, body):
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', self.server.server_port)
+        try:
+            headers = {}
+            if body is not None:
+                body = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, url, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status, response.getheader(QUERY_COUNT_HEADER)
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(ordered, p):
+    # nearest rank percentile of a sorted list
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+
+def run_scenario(transport, scenario, total, requests, workers, seed):
+    # Every worker draws its requests from its own seeded generator
+    def worker(index):
+        rng = random.Random('{}-{}'.format(seed, index))
+        samples = []
+        for _ in range(index, requests, workers):
+            method, url, body = scenario(rng, total)
+            start = time.perf_counter()
+            status, queries = transport.send(method, url, body)
+            samples.append((time.perf_counter() - start, status,
+                            int(queries or 0)))
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        samples = [s for batch in executor.map(worker, range(workers))
+                   for s in batch]
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, status, queries in samples)
+    result = {
+        'requests': len(samples),
+        'errors': sum(status >= 400 for latency, status, queries in samples),
+        'throughput': len(samples) / elapsed if elapsed else 0.0,
+        'queries': max([queries for latency, status, queries in samples] or [0]),
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+    }
+    for p in PERCENTILES:
+        result['p{}_ms'.format(p)] = percentile(latencies, p) * 1000
+    return result
+
+
+def print_results(results):
+    columns = ['requests', 'errors', 'throughput'] + \
+        ['p{}_ms'.format(p) for p in PERCENTILES] + ['max_ms', 'queries']
+    width = max(len(name) for name in results)
+    print('{:{}}  '.format('endpoint', width) +
+          ' '.join('{:>10}'.format(column) for column in columns))
+    for name, result in results.items():
+        print('{:{}}  '.format(name, width) + ' '.join(
+            '{:>10.2f}'.format(result[column]) if isinstance(result[column], float)
+            else '{:>10}'.format(result[column]) for column in columns))
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Regressions against `baseline`: endpoints whose p90 latency grew by
+    more than `tolerance` (a fraction) or that run more statements.
+    '''
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if result['p90_ms'] > base['p90_ms'] * (1 + tolerance):
+            regressions.append('{}: p90 {:.2f} ms, baseline {:.2f} ms'.format(
+                name, result['p90_ms'], base['p90_ms']))
+        if result['queries'] > base['queries']:
+            regressions.append('{}: {} queries per request, baseline {}'.format(
+                name, result['queries'], base['queries']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--reset', action='store_true',
+                        help='drop the tables of --database-url and seed it')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=500,
+                        help='requests per endpoint')
+    parser.add_argument('--server', action='store_true',
+                        help='send HTTP requests to a threaded WSGI server')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', metavar='FILE')
+    parser.add_argument('--compare', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    path = None
+    database_url = args.database_url
+    if database_url is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        database_url = 'sqlite:///' + path
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+        with app.app_context():
+            if path is not None or args.reset:
+                seed(args.questions, args.seed, reset=True)
+            total = Question.query.count()
+            count_queries(app)
+            db.session.remove()
+        transport = (ServerTransport if args.server else ClientTransport)(app)
+        try:
+            results = {
+                name: run_scenario(transport, scenario, total, args.requests,
+                                   args.workers, args.seed)
+                for name, scenario in SCENARIOS.items()
+            }
+        finally:
+            transport.close()
+    finally:
+        if path is not None:
+            os.remove(path)
+
+    print_results(results)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump({
+                'settings': {
+                    'database': database_url.split(':', 1)[0],
+                    'questions': total,
+                    'workers': args.workers,
+                    'requests': args.requests,
+                    'server': args.server,
+                },
+                'results': results,
+            }, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
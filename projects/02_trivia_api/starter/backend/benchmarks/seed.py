@@ -0,0 +1,84 @@
+'''
+Synthetic question banks for the benchmarks. Questions are drawn from a
+fixed vocabulary so searches match a realistic share of them, the same
+seed always generates the same bank.
+
+Seeds an empty database, --reset first drops its tables (and every
+question and category in them):
+
+    python -m benchmarks.seed --database-url URL [--reset] [--questions N]
+'''
+import argparse
+import random
+import sys
+
+from bulk import import_questions
+from models import db, Category, Question
+
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment',
+              'Sports')
+WORDS = (
+    'africa', 'album', 'atlas', 'battle', 'bridge', 'canvas', 'capital',
+    'castle', 'champion', 'chemistry', 'comet', 'composer', 'desert',
+    'dynasty', 'element', 'empire', 'festival', 'film', 'football',
+    'galaxy', 'glacier', 'guitar', 'harbor', 'island', 'jungle', 'kingdom',
+    'lake', 'language', 'marathon', 'medal', 'molecule', 'mountain',
+    'museum', 'novel', 'ocean', 'olympic', 'opera', 'painter', 'palace',
+    'planet', 'poet', 'portrait', 'president', 'pyramid', 'queen', 'river',
+    'sculpture', 'season', 'series', 'soccer', 'stadium', 'statue', 'symphony',
+    'telescope', 'temple', 'tennis', 'theory', 'treaty', 'tribe', 'volcano',
+)
+
+
+def question_rows(count, rng):
+    # (number, data) pairs in the shape read by `bulk.import_questions`
+    for number in range(1, count + 1):
+        yield number, {
+            'question': 'Which {} ?'.format(' '.join(rng.sample(WORDS, 6))),
+            'answer': ' '.join(rng.sample(WORDS, 2)).capitalize(),
+            'category': rng.randint(1, len(CATEGORIES)),
+            'difficulty': rng.randint(1, 5),
+        }
+
+
+def seed(count, seed=0, reset=False):
+    '''
+    Inserts the categories and `count` generated questions (with COPY on
+    Postgres), the tables are dropped and recreated first with `reset`.
+    Without it the database must be empty. Returns the number of inserted
+    questions.
+    '''
+    if reset:
+        db.drop_all()
+    db.create_all()
+    if not reset and (Category.query.first() or Question.query.first()):
+        raise RuntimeError('the database already has questions')
+    for type in CATEGORIES:
+        db.session.add(Category(type))
+    db.session.commit()
+    report = import_questions(question_rows(count, random.Random(seed)))
+    return report["inserted"]
+
+
+def main():
+    from flaskr import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--reset', action='store_true',
+                        help='drop the tables of --database-url first')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+    with app.app_context():
+        try:
+            inserted = seed(args.questions, args.seed, args.reset)
+        except RuntimeError as error:
+            sys.exit('{}, --reset replaces them'.format(error))
+        print('{} questions inserted'.format(inserted))
+
+
+if __name__ == '__main__':
+    main()
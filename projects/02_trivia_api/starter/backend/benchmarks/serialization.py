@@ -0,0 +1,81 @@
+'''
+Compares the old and new ways of rendering a list of questions:
+
+    orm     Question objects, `Question.format()` and `flask.jsonify`
+    json    column tuples, `question_dicts` and the stdlib encoder of
+            `json_provider.jsonify`
+    orjson  the same with orjson (skipped when it is not installed)
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization [--questions N] [--page-size N]
+'''
+import argparse
+import os
+import tempfile
+import timeit
+
+import flask
+
+import json_provider
+from flaskr import create_app
+from models import db, Question, Category, QUESTION_COLUMNS, question_dicts
+
+
+def seed(count):
+    db.session.add(Category('Science'))
+    db.session.flush()
+    db.session.bulk_insert_mappings(Question, [{
+        'question': 'Generated question number {} ?'.format(n),
+        'answer': 'Answer {}'.format(n),
+        'category': 1,
+        'difficulty': 1 + n % 5,
+    } for n in range(count)])
+    db.session.commit()
+
+
+def orm_page(page_size):
+    questions = Question.query.order_by(Question.id).limit(page_size).all()
+    return flask.jsonify(questions=[q.format() for q in questions])
+
+
+def rows_page(page_size):
+    rows = Question.query.with_entities(*QUESTION_COLUMNS) \
+        .order_by(Question.id).limit(page_size).all()
+    return json_provider.jsonify(questions=question_dicts(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--questions', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path})
+        with app.app_context():
+            seed(args.questions)
+            paths = [('orm', orm_page, None), ('json', rows_page, 'json')]
+            if 'orjson' in json_provider.BACKENDS:
+                paths.append(('orjson', rows_page, 'orjson'))
+            baseline = None
+            for name, render, backend in paths:
+                app.extensions['json_backend'] = json_provider.BACKENDS.get(
+                    backend, json_provider.json_dumps)
+                best = min(timeit.repeat(
+                    lambda: render(args.page_size),
+                    repeat=args.repeat, number=args.number)) / args.number
+                baseline = baseline or best
+                print('{:8} {:8.2f} ms/page  x{:.2f}'.format(
+                    name, best * 1000, baseline / best))
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
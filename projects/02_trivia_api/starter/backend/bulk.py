@@ -0,0 +1,235 @@
+import csv
+import io
+import json
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from models import db, Question, category_cache, validate_question
+from quiz import question_ids
+from search import question_search
+
+# Questions inserted per statement (and transaction)
+IMPORT_BATCH_SIZE = 1000
+# Rows fetched per round trip by the export
+EXPORT_FETCH_SIZE = 1000
+# Rejected rows described in an import report, the others are only counted
+MAX_REPORTED_ERRORS = 100
+# Questions deleted or updated per statement (and transaction)
+BATCH_SIZE = 500
+# Ids accepted by one batch delete or update
+MAX_BATCH_IDS = 10000
+QUESTION_FIELDS = ('question', 'answer', 'category', 'difficulty')
+EXPORT_FIELDS = ('id',) + QUESTION_FIELDS
+
+
+def ndjson_rows(lines):
+    # (line number, object) of every non blank line, invalid JSON is
+    # reported by the import like any other invalid row
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, ValueError("invalid JSON")
+
+
+def csv_rows(lines):
+    # (line number, row) of a CSV file whose header names the fields
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_rows(lines, format):
+    return csv_rows(lines) if format == 'csv' else ndjson_rows(lines)
+
+
+def copy_questions(connection, rows):
+    # COPY skips the per row statement overhead of an INSERT
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(
+        [row[field] for field in QUESTION_FIELDS] for row in rows)
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            'COPY questions ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                ', '.join(QUESTION_FIELDS)),
+            buffer)
+    finally:
+        cursor.close()
+
+
+def insert_questions(rows):
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        copy_questions(connection, rows)
+    else:
+        connection.execute(Question.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def import_questions(rows, batch_size=IMPORT_BATCH_SIZE):
+    '''
+    Inserts the valid questions of `rows` ((line number, data) pairs) in
+    batches of `batch_size`, each batch in its own transaction. Rows are
+    checked by `validate_question`, like questions created one at a time.
+    Returns the number of inserted and rejected rows and the reasons of the
+    first rejections.
+    '''
+    categories = category_cache.get()
+    report = {"inserted": 0, "rejected": 0, "errors": []}
+    batch = []
+    try:
+        for line, data in rows:
+            try:
+                if isinstance(data, ValueError):
+                    raise data
+                batch.append(validate_question(data, categories))
+            except ValueError as error:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": line, "msg": str(error)})
+                continue
+            if len(batch) >= batch_size:
+                report["inserted"] += insert_questions(batch)
+                batch = []
+        if batch:
+            report["inserted"] += insert_questions(batch)
+    finally:
+        # core inserts skip the ORM events that keep these up to date
+        question_ids.invalidate()
+        question_search.invalidate()
+    return report
+
+
+def export_questions(category=None):
+    '''
+    NDJSON lines of the questions ordered by id. Rows are read through a
+    server side cursor `EXPORT_FETCH_SIZE` at a time, memory use doesn't
+    depend on the number of questions.
+    '''
+    query = db.session.query(
+        Question.id, Question.question, Question.answer,
+        Question.category, Question.difficulty
+    ).order_by(Question.id)
+    if category is not None:
+        query = query.filter(Question.category == category)
+    for row in query.yield_per(EXPORT_FETCH_SIZE):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+def id_chunks(ids, size=BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def matching_id_chunks(filters, size=BATCH_SIZE):
+    # Ids of the questions matching `filters`, `size` at a time in id order.
+    # Read just before each chunk is processed, a chunk starts after the
+    # last id of the previous one
+    last_id = 0
+    while True:
+        ids = [id for (id,) in db.session.query(Question.id).filter(
+            Question.id > last_id, *filters).order_by(Question.id).limit(size)]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def apply_in_batches(statement, chunks):
+    '''
+    Runs `statement` (a DELETE or UPDATE of questions) on every chunk of
+    ids, one set based statement and transaction per chunk. Returns the ids
+    of the questions found.
+    '''
+    affected = []
+    try:
+        for ids in chunks:
+            connection = db.session.connection()
+            condition = Question.id.in_(ids)
+            if connection.dialect.name == 'postgresql':
+                found = [id for (id,) in connection.execute(
+                    statement.where(condition).returning(Question.id))]
+            else:
+                found = [id for (id,) in connection.execute(
+                    select([Question.id]).where(condition))]
+                if found:
+                    connection.execute(statement.where(Question.id.in_(found)))
+            db.session.commit()
+            affected += found
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        # core statements skip the ORM events that keep these up to date
+        question_ids.invalidate()
+        question_search.invalidate()
+    return affected
+
+
+def batch_outcomes(ids, affected):
+    # Outcome of every requested id, in request order, or of every question
+    # matched by a filter
+    if ids is None:
+        return [{"id": id, "success": True} for id in affected]
+    affected = set(affected)
+    return [{"id": id, "success": id in affected} for id in ids]
+
+
+def batch_chunks(ids, filters):
+    return matching_id_chunks(filters) if ids is None else id_chunks(ids)
+
+
+def delete_questions(ids=None, filters=None):
+    '''
+    Deletes the questions of `ids`, or those matching `filters` when `ids`
+    is None, returns the outcome of every id.
+    '''
+    affected = apply_in_batches(
+        Question.__table__.delete(), batch_chunks(ids, filters))
+    return batch_outcomes(ids, affected)
+
+
+def update_questions(values, ids=None, filters=None):
+    '''
+    Sets `values` (checked fields of a question) on the questions of `ids`,
+    or those matching `filters` when `ids` is None, returns the outcome of
+    every id.
+    '''
+    affected = apply_in_batches(
+        Question.__table__.update().values(**values), batch_chunks(ids, filters))
+    return batch_outcomes(ids, affected)
+
+
+@click.group('questions')
+def questions_cli():
+    """Bulk import and export of questions."""
+
+
+@questions_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['ndjson', 'csv']),
+              help='Defaults to csv for .csv files, ndjson otherwise.')
+@with_appcontext
+def import_command(file, format):
+    """Imports the questions of an NDJSON or CSV file."""
+    if format is None:
+        format = 'csv' if file.name.endswith('.csv') else 'ndjson'
+    report = import_questions(read_rows(file, format))
+    click.echo('{inserted} inserted, {rejected} rejected'.format(**report))
+    for error in report["errors"]:
+        click.echo('line {line}: {msg}'.format(**error), err=True)
+
+
+@questions_cli.command('export')
+@click.argument('file', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--category', type=int, help='Only export this category.')
+@with_appcontext
+def export_command(file, category):
+    """Exports the questions as NDJSON (to stdout by default)."""
+    file.writelines(export_questions(category))
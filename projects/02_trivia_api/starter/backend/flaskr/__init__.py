@@ -1,22 +1,81 @@
 import os
-from flask import Flask, json, request, abort, jsonify
+from flask import Flask, json, request, abort, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
+from sqlalchemy import func
 
-from models import setup_db, Question, Category
+from models import setup_db, Question, category_cache, validate_question
+from models import QUESTION_COLUMNS, question_dicts
+from quiz import next_question, start_quiz, next_session_question
+from search import question_search, question_filters, search_words
+from bulk import import_questions, export_questions, read_rows, questions_cli
+from bulk import delete_questions, update_questions, MAX_BATCH_IDS
+import json_provider
+from json_provider import jsonify
 
 QUESTIONS_PER_PAGE = 10
 
 
+'''
+Page of `query` (formatted questions ordered by id, `QUESTIONS_PER_PAGE`
+per page) along with the number of questions matched by `query`, both read
+by one statement through a `count(*) OVER ()` window. Only the columns are
+selected, no Question object is built.
+'''
+
+
+def paginate_questions(query, page):
+    page = max(page, 1)
+    rows = query.with_entities(*QUESTION_COLUMNS, func.count().over()) \
+        .order_by(Question.id).limit(QUESTIONS_PER_PAGE) \
+        .offset((page - 1) * QUESTIONS_PER_PAGE).all()
+    if rows:
+        return question_dicts(rows), rows[0][-1]
+    # past the last page the window has no row to report the total on
+    return [], query.count() if page > 1 else 0
+
+
+'''
+Questions targeted by a batch request: either an "ids" list or a "filter"
+object of category and/or difficulty. Returns (ids, None) or
+(None, filters), raises ValueError for anything else.
+'''
+
+
+def batch_target(body):
+    if not isinstance(body, dict):
+        raise ValueError("body must be an object")
+    ids = body.get("ids")
+    filter = body.get("filter")
+    if (ids is None) == (filter is None):
+        raise ValueError("either ids or filter is required")
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or len(ids) > MAX_BATCH_IDS \
+                or not all(type(id) is int for id in ids):
+            raise ValueError("ids must be a list of at most {} integers"
+                             .format(MAX_BATCH_IDS))
+        return ids, None
+    if not isinstance(filter, dict) or not filter or \
+            set(filter) - {"category", "difficulty"} or \
+            not all(type(value) is int for value in filter.values()):
+        raise ValueError("filter takes an integer category and difficulty")
+    return None, question_filters(**filter)
+
+
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
     app.config.from_object('config')
+    if test_config is not None:
+        app.config.from_mapping(test_config)
     # Setting up database
     setup_db(app)
+    # orjson responses when it is installed
+    json_provider.init_app(app)
     # Setting up cors
     cors = CORS(app, resources={r"/*": {"origins": "*"}})
+    # `flask questions import|export`
+    app.cli.add_command(questions_cli)
 
     @app.after_request
     def afterRequest(response):
@@ -25,10 +84,19 @@ def create_app(test_config=None):
 
     '''
     Grab all available categories.
+    Served with a strong ETag, clients revalidating an unchanged map get
+    an empty 304.
     '''
     @app.route("/categories")
     def getCategories():
-        return jsonify(categories={c.id: c.type for c in Category.query.all()})
+        categories, etag = category_cache.load()
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(categories=categories)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
 
     '''
     Grabbing all questions chuncked to pages according to `QUESTIONS_PER_PAGE`
@@ -36,11 +104,8 @@ def create_app(test_config=None):
     @app.route("/questions")
     def getQuestuions():
         page = request.args.get("page", 1, type=int)
-        questions = Question.query.order_by(Question.id).paginate(
-            page, QUESTIONS_PER_PAGE, error_out=False)
-        total_questions = questions.total
-        questions = [q.format() for q in questions.items]
-        categories = {c.id: c.type for c in Category.query.all()}
+        questions, total_questions = paginate_questions(Question.query, page)
+        categories = category_cache.get()
         current_category = None
         return jsonify(
             total_questions=total_questions,
@@ -61,31 +126,103 @@ def create_app(test_config=None):
     @app.route("/questions/create", methods=["POST"])
     def addQuestuions():
         try:
-            question = request.json.get("question")
-            answer = request.json.get("answer")
-            category = int(request.json.get("category"))
-            difficulty = int(request.json.get("difficulty"))
-            assert isinstance(question, str) and len(question) > 5
-            assert isinstance(answer, str) and len(answer) > 1
-            assert isinstance(category, int)
-            assert isinstance(difficulty, int)
-            Question(
-                question=question,
-                answer=answer,
-                category=category,
-                difficulty=difficulty,
-            ).insert()
+            Question(**validate_question(
+                request.json, category_cache.get())).insert()
         except BaseException:
             return jsonify(error=True, msg="Failed to add question"), 400
         return jsonify(error=False), 201
 
+    '''
+    Bulk import of NDJSON (one question object per line) or CSV (with a
+    question,answer,category,difficulty header) questions, the body is
+    read as a stream and inserted in batches.
+    '''
+    @app.route("/questions/import", methods=["POST"])
+    def importQuestions():
+        format = request.args.get("format")
+        if format is None:
+            format = "csv" if request.mimetype == "text/csv" else "ndjson"
+        if format not in ("csv", "ndjson"):
+            abort(400)
+        lines = (line.decode("utf-8") for line in request.stream)
+        try:
+            report = import_questions(read_rows(lines, format))
+        except UnicodeDecodeError:
+            abort(400)
+        return jsonify(error=False, **report), 201
+
+    '''
+    Streams every question (or those of the `category` argument) as NDJSON.
+    '''
+    @app.route("/questions/export")
+    def exportQuestions():
+        category = request.args.get("category", None, type=int)
+        return Response(
+            stream_with_context(export_questions(category)),
+            mimetype="application/x-ndjson")
+
+    '''
+    Batch delete and update of the questions of an "ids" list or matching
+    a "filter", one set based statement and transaction per `bulk.BATCH_SIZE`
+    questions. The outcome of every id is reported, ids without a question
+    fail.
+    '''
+    @app.route("/questions/batch/delete", methods=["POST"])
+    def deleteQuestionsBatch():
+        try:
+            ids, filters = batch_target(request.get_json(silent=True))
+        except ValueError:
+            abort(400)
+        results = delete_questions(ids, filters)
+        return jsonify(
+            error=False,
+            deleted=sum(result["success"] for result in results),
+            results=results
+        )
+
+    @app.route("/questions/batch/update", methods=["POST"])
+    def updateQuestionsBatch():
+        body = request.get_json(silent=True)
+        try:
+            ids, filters = batch_target(body)
+            values = validate_question(
+                body.get("values"), category_cache.get(), partial=True)
+        except ValueError:
+            abort(400)
+        results = update_questions(values, ids, filters)
+        return jsonify(
+            error=False,
+            updated=sum(result["success"] for result in results),
+            results=results
+        )
+
+    '''
+    Full text search of the questions and answers (see search.py), ranked
+    by relevance with the matched words highlighted. Optional category and
+    difficulty filters, an empty search term lists the questions.
+    '''
     @app.route("/questions/search", methods=["POST"])
     def searchQuestuions():
         query = request.json.get("searchTerm")
-        total_questions = Question.query.count()
-        questions = [q.format() for q in Question.query.filter(
-            Question.question.ilike(f"%{query}%"))]
-        current_category = None
+        page = request.json.get(
+            "page", request.args.get("page", 1, type=int))
+        category = request.json.get("category")
+        difficulty = request.json.get("difficulty")
+        if not isinstance(page, int) or any(
+                value is not None and not isinstance(value, int)
+                for value in (category, difficulty)):
+            abort(400)
+        if search_words(query):
+            results, total_questions = question_search.search(
+                query, page, QUESTIONS_PER_PAGE,
+                category=category, difficulty=difficulty)
+            questions = [dict(r.question, highlight=r.highlight)
+                         for r in results]
+        else:
+            questions, total_questions = paginate_questions(
+                Question.query.filter(*question_filters(category, difficulty)),
+                page)
+        current_category = category
         return jsonify(
             total_questions=total_questions,
             questions=questions,
@@ -94,10 +231,9 @@ def create_app(test_config=None):
 
     @app.route("/categories/<int:id>/questions")
     def getQuestuionsOfCategory(id):
-        total_questions = Question.query.count()
-        questions = [
-            q.format() for q in Question.query.filter(
-                Question.category == id).all()]
+        page = request.args.get("page", 1, type=int)
+        questions, total_questions = paginate_questions(
+            Question.query.filter(Question.category == id), page)
         current_category = None
         return jsonify(
             total_questions=total_questions,
@@ -105,20 +241,41 @@ def create_app(test_config=None):
             current_category=current_category
         )
 
+    '''
+    Random question of the quiz category not asked yet, only the chosen
+    question is read from the database (see `quiz.QuestionIds`).
+    '''
     @app.route("/quizzes", methods=["POST"])
     def getQuizQuestuion():
-        question = None
         previous_questions = request.json.get("previous_questions", [])
         quiz_category = int(request.json.get("quiz_category", {"id": 0})["id"])
-        questions = Question.query
-        if quiz_category > 0:
-            questions = questions.filter(Question.category == quiz_category)
-
-        questions = list(map(lambda q: q.format(), questions.filter(
-            Question.id.notin_(previous_questions)).all()))
-        if questions:
-            question = random.choice(questions)
-        return jsonify(question=question)
+        question = next_question(quiz_category, previous_questions)
+        return jsonify(question=question.format() if question else None)
+
+    '''
+    Quiz sessions: the server remembers the questions already asked, the
+    client only keeps the session id.
+    '''
+    @app.route("/quizzes/sessions", methods=["POST"])
+    def createQuizSession():
+        body = request.get_json(silent=True) or {}
+        try:
+            quiz_category = int(body.get("quiz_category", {"id": 0})["id"])
+        except (KeyError, TypeError, ValueError):
+            abort(400)
+        session_id, total_questions = start_quiz(quiz_category)
+        return jsonify(
+            session_id=session_id,
+            total_questions=total_questions
+        ), 201
+
+    @app.route("/quizzes/sessions/<session_id>/next", methods=["POST"])
+    def getQuizSessionQuestion(session_id):
+        try:
+            question = next_session_question(session_id)
+        except KeyError:
+            abort(404)
+        return jsonify(question=question.format() if question else None)
 
     # Error handling
     @ app.errorhandler(400)
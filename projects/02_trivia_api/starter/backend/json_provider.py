@@ -0,0 +1,54 @@
+import json
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used instead
+    orjson = None
+
+# Fast JSON responses. The coffee shop keeps a copy of the trivia app's
+# json_provider.py, written by `python tools/shared_files.py --sync`.
+# `jsonify` builds the responses of `flask.jsonify` with the encoder
+# picked by `init_app`: orjson when it is installed, the standard library
+# otherwise. The JSON_BACKEND setting ('orjson' or 'json') forces one.
+# Types neither encoder knows go through the app's `json_encoder`, orjson
+# writes dates as ISO 8601 rather than HTTP dates.
+
+
+def orjson_dumps(obj, sort_keys, default):
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=option)
+
+
+def json_dumps(obj, sort_keys, default):
+    return json.dumps(obj, sort_keys=sort_keys, default=default,
+                      separators=(',', ':'))
+
+
+BACKENDS = {'json': json_dumps}
+if orjson is not None:
+    BACKENDS['orjson'] = orjson_dumps
+
+
+def init_app(app):
+    name = app.config.get('JSON_BACKEND') or (
+        'orjson' if 'orjson' in BACKENDS else 'json')
+    if name not in BACKENDS:
+        raise RuntimeError('JSON_BACKEND {!r} is not available'.format(name))
+    app.extensions['json_backend'] = BACKENDS[name]
+
+
+def dumps(obj, app=None):
+    app = app or current_app
+    backend = app.extensions.get('json_backend', json_dumps)
+    return backend(obj, app.config['JSON_SORT_KEYS'], app.json_encoder().default)
+
+
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    data = args[0] if len(args) == 1 else args or kwargs
+    return current_app.response_class(
+        dumps(data), mimetype=current_app.config['JSONIFY_MIMETYPE'])
@@ -0,0 +1,33 @@
+-- Question.category as an integer foreign key to categories, with the
+-- indexes of the category, pagination and quiz queries.
+-- Safe to run more than once: psql trivia < migrations/0001_question_category_fk.sql
+
+BEGIN;
+
+ALTER TABLE public.questions
+    ALTER COLUMN category TYPE integer USING category::integer;
+
+-- questions of deleted categories lose their category, like ON DELETE SET NULL
+UPDATE public.questions SET category = NULL
+WHERE category IS NOT NULL
+    AND category NOT IN (SELECT id FROM public.categories);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'public.questions'::regclass AND contype = 'f'
+    ) THEN
+        ALTER TABLE ONLY public.questions
+            ADD CONSTRAINT category FOREIGN KEY (category)
+            REFERENCES public.categories(id) ON UPDATE CASCADE ON DELETE SET NULL;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS questions_category_id_idx
+    ON public.questions USING btree (category, id);
+CREATE INDEX IF NOT EXISTS questions_category_difficulty_idx
+    ON public.questions USING btree (category, difficulty);
+
+COMMIT;
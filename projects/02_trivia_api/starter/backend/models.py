@@ -1,9 +1,21 @@
-from sqlalchemy import Column, String, Integer, create_engine
+import hashlib
+import json
+import threading
+import time
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine, event, DDL
 from flask_sqlalchemy import SQLAlchemy
+from engine_config import configure_engine, register_pool_metrics
 
 
 db = SQLAlchemy()
 
+# Seconds before the category map is read again, picks up the changes
+# made by other processes
+CATEGORY_CACHE_TTL = 300
+# Text search configuration of the questions full text index, queries
+# must use the same one (and the same expression) for Postgres to use it
+SEARCH_CONFIG = 'english'
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -11,8 +23,10 @@ setup_db(app)
 
 
 def setup_db(app):
+    configure_engine(app)
     db.app = app
     db.init_app(app)
+    register_pool_metrics(app, db)
     db.create_all()
 
 
@@ -28,10 +42,17 @@ class Question(db.Model):
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    # Why and How String ?? Should be Integer to hold Category id
-    category = Column(String)
+    category = Column(Integer, ForeignKey(
+        'categories.id', onupdate='CASCADE', ondelete='SET NULL'))
     difficulty = Column(Integer)
 
+    # (category, id) serves the category pages and quiz ids, (category,
+    # difficulty) the search filters
+    __table_args__ = (
+        Index('questions_category_id_idx', 'category', 'id'),
+        Index('questions_category_difficulty_idx', 'category', 'difficulty'),
+    )
+
     def __init__(self, question, answer, category, difficulty):
         self.question = question
         self.answer = answer
@@ -59,6 +80,70 @@ class Question(db.Model):
         }
 
 
+'''
+question_dicts(rows)
+    `Question.format()` dicts of rows selected with
+    `query.with_entities(*QUESTION_COLUMNS)`, list pages skip building
+    (and tracking) a Question object per row
+'''
+QUESTION_KEYS = ('id', 'question', 'answer', 'category', 'difficulty')
+QUESTION_COLUMNS = tuple(getattr(Question, key) for key in QUESTION_KEYS)
+
+
+def question_dicts(rows):
+    return [dict(zip(QUESTION_KEYS, row)) for row in rows]
+
+
+'''
+validate_question(data, categories=None, partial=False)
+    returns the fields of a question read from `data` (a dict), raises
+    ValueError describing the first invalid field. The category must be
+    one of `categories` when given. With `partial` only the fields present
+    are checked (and returned), for updates
+'''
+
+
+def validate_question(data, categories=None, partial=False):
+    if not isinstance(data, dict):
+        raise ValueError("question must be an object")
+    fields = {}
+    for field in ("question", "answer", "category", "difficulty"):
+        if partial and field not in data:
+            continue
+        fields[field] = data.get(field)
+    if not fields:
+        raise ValueError("no question field to update")
+    try:
+        for field in ("category", "difficulty"):
+            if field in fields:
+                fields[field] = int(fields[field])
+    except (TypeError, ValueError):
+        raise ValueError("category and difficulty must be integers")
+    if "question" in fields and (
+            not isinstance(fields["question"], str) or len(fields["question"]) <= 5):
+        raise ValueError("question must be longer than 5 characters")
+    if "answer" in fields and (
+            not isinstance(fields["answer"], str) or len(fields["answer"]) <= 1):
+        raise ValueError("answer must be longer than 1 character")
+    if categories is not None and "category" in fields and \
+            fields["category"] not in categories:
+        raise ValueError("unknown category {}".format(fields["category"]))
+    return fields
+
+
+'''
+Full text index of the questions and their answers (see search.py),
+question words weigh more than answer words in the ranking.
+trivia.psql creates the same index.
+'''
+event.listen(Question.__table__, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS questions_search_idx ON questions "
+    "USING gin ((setweight(to_tsvector('{0}', coalesce(question, '')), 'A') "
+    "|| setweight(to_tsvector('{0}', coalesce(answer, '')), 'B')))"
+    .format(SEARCH_CONFIG)
+).execute_if(dialect='postgresql'))
+
+
 '''
 Category
 
@@ -79,3 +164,59 @@ class Category(db.Model):
             'id': self.id,
             'type': self.type
         }
+
+
+'''
+CategoryCache
+    the {id: type} map of the categories, read once and kept until
+    invalidated (or for CATEGORY_CACHE_TTL seconds)
+'''
+
+
+class CategoryCache(object):
+
+    def __init__(self, ttl=CATEGORY_CACHE_TTL):
+        self.ttl = ttl
+        # incremented on every invalidation
+        self.version = 0
+        self.categories = None
+        self.etag = None
+        self.expires = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        return self.load()[0]
+
+    def load(self):
+        # Returns the map and its ETag, a hash of the content so every
+        # process serves the same one
+        with self.lock:
+            if self.categories is not None and self.expires > time.monotonic():
+                return self.categories, self.etag
+            version = self.version
+        categories = {c.id: c.type for c in Category.query.order_by(Category.id)}
+        etag = hashlib.sha1(json.dumps(
+            sorted(categories.items())).encode('utf-8')).hexdigest()
+        with self.lock:
+            # a map read before an invalidation is served but not kept
+            if version == self.version:
+                self.categories = categories
+                self.etag = etag
+                self.expires = time.monotonic() + self.ttl
+        return categories, etag
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.categories = None
+            self.etag = None
+
+
+category_cache = CategoryCache()
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def categories_changed(mapper, connection, category):
+    category_cache.invalidate()
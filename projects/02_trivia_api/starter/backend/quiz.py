@@ -0,0 +1,205 @@
+import hashlib
+import random
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from sqlalchemy import event
+
+from models import Question
+
+# Rows read per round trip while loading the ids of a category
+ID_FETCH_SIZE = 1000
+# Seconds before the ids of a category are loaded again, picks up the
+# questions added or deleted by other processes
+IDS_TTL = 60
+# Random draws tried before scanning for the questions left
+MAX_DRAWS = 16
+# Seconds a quiz session is kept after its last question
+QUIZ_SESSION_TTL = 30 * 60
+# Sessions kept per process, the least recently used are dropped first
+MAX_QUIZ_SESSIONS = 10000
+# Rounds of the Feistel network shuffling the questions of a session
+SHUFFLE_ROUNDS = 4
+
+
+class QuestionIds(object):
+    '''
+    Ids of the questions of every category (0 for all of them) kept in
+    compact arrays, so picking a quiz question costs a random draw and a
+    primary key lookup whatever the size of the question bank.
+    '''
+
+    def __init__(self, ttl=IDS_TTL):
+        self.ttl = ttl
+        # incremented on every invalidation
+        self.version = 0
+        self.arrays = {}
+        self.lock = threading.Lock()
+
+    def get(self, category):
+        with self.lock:
+            entry = self.arrays.get(category)
+            if entry is not None and entry[1] >= time.monotonic():
+                return entry[0]
+            version = self.version
+        ids = self.load(category)
+        with self.lock:
+            # ids read before an invalidation are used but not kept
+            if version == self.version:
+                self.arrays[category] = (ids, time.monotonic() + self.ttl)
+        return ids
+
+    def load(self, category):
+        query = Question.query.with_entities(Question.id)
+        if category:
+            query = query.filter(Question.category == category)
+        rows = query.order_by(Question.id).yield_per(ID_FETCH_SIZE)
+        return array('l', (id for (id,) in rows))
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.arrays.clear()
+
+    def choose(self, category, previous=(), rng=random):
+        '''
+        Random id of `category` not in `previous`. Draws are rejected while
+        they hit a previous question, the ids left are only listed once
+        most of the category has been asked.
+        '''
+        ids = self.get(category)
+        if not ids:
+            return None
+        previous = set(previous)
+        for _ in range(MAX_DRAWS):
+            id = ids[rng.randrange(len(ids))]
+            if id not in previous:
+                return id
+        remaining = [id for id in ids if id not in previous]
+        return rng.choice(remaining) if remaining else None
+
+
+question_ids = QuestionIds()
+
+
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+def questions_changed(mapper, connection, question):
+    question_ids.invalidate()
+
+
+def next_question(category, previous=()):
+    '''
+    Random question of `category` (0 for any) not in `previous`, None when
+    all of them were asked.
+    '''
+    for _ in range(2):
+        id = question_ids.choose(category, previous)
+        if id is None:
+            return None
+        question = Question.query.get(id)
+        if question is not None:
+            return question
+        # deleted by another process since the ids were loaded
+        question_ids.invalidate()
+    return None
+
+
+def shuffled_index(position, size, key):
+    '''
+    Index at `position` of a pseudo random permutation of range(`size`)
+    drawn from `key`, computed without listing the permutation: a keyed
+    Feistel network over the smallest even number of bits covering `size`,
+    applied again while the result is out of range.
+    '''
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    index = position
+    while True:
+        left, right = index >> half_bits, index & mask
+        for round in range(SHUFFLE_ROUNDS):
+            digest = hashlib.blake2b(
+                b'%d:%d' % (round, right), digest_size=8, key=key).digest()
+            left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+        index = (left << half_bits) | right
+        if index < size:
+            return index
+
+
+class QuizSessions(object):
+    '''
+    Quiz sessions kept in process memory. Sessions of a category share the
+    array of its question ids (one per load of `question_ids`), a session
+    only holds the key of its order and the position of the next question,
+    asking a question is an increment and a primary key lookup.
+    Sessions expire `ttl` seconds after their last use, they are ordered by
+    expiry so evicting them only looks at the oldest ones.
+    '''
+
+    def __init__(self, ttl=QUIZ_SESSION_TTL, max_sessions=MAX_QUIZ_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session id -> [ids, key, position, expires], `ids` is never copied
+        # nor modified
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, ids, rng=random):
+        key = rng.getrandbits(128).to_bytes(16, 'big')
+        session_id = secrets.token_urlsafe(12)
+        with self.lock:
+            self._evict(time.monotonic())
+            self.sessions[session_id] = [ids, key, 0, time.monotonic() + self.ttl]
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id, len(ids)
+
+    def next_id(self, session_id):
+        '''
+        Following question id of the session, None once all were asked.
+        Raises KeyError for unknown and expired sessions.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            session = self.sessions[session_id]
+            session[3] = now + self.ttl
+            self.sessions.move_to_end(session_id)
+            ids, key, position = session[0], session[1], session[2]
+            if position >= len(ids):
+                return None
+            session[2] = position + 1
+        return ids[shuffled_index(position, len(ids), key)]
+
+    def _evict(self, now):
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session[3] >= now:
+                break
+            del self.sessions[session_id]
+
+
+quiz_sessions = QuizSessions()
+
+
+def start_quiz(category):
+    # Returns the id of the new session and its number of questions
+    return quiz_sessions.create(question_ids.get(category))
+
+
+def next_session_question(session_id):
+    '''
+    Following question of the session, None when the quiz is over.
+    Raises KeyError for unknown and expired sessions.
+    '''
+    while True:
+        id = quiz_sessions.next_id(session_id)
+        if id is None:
+            return None
+        question = Question.query.get(id)
+        # questions deleted since the session started are skipped
+        if question is not None:
+            return question
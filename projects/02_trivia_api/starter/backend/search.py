@@ -0,0 +1,252 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from sqlalchemy import event, func
+
+from models import db, Question, SEARCH_CONFIG, QUESTION_COLUMNS, question_dicts
+
+# Rows fetched per round trip while building the in-process index
+INDEX_FETCH_SIZE = 1000
+# Marks around the matched words of the highlighted texts
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+HEADLINE_OPTIONS = 'StartSel={}, StopSel={}, HighlightAll=true'.format(
+    HIGHLIGHT_START, HIGHLIGHT_STOP)
+# Weight of answer words against question words, the default ts_rank
+# weights of the 'B' and 'A' labels of the Postgres index
+ANSWER_WEIGHT = 0.4
+
+WORD = re.compile(r'\w+')
+
+# A matching question (formatted like `Question.format()`) with its
+# question and answer texts highlighted
+SearchResult = namedtuple('SearchResult', ['question', 'highlight'])
+
+
+def search_words(text):
+    return WORD.findall((text or '').lower())
+
+
+def question_filters(category=None, difficulty=None):
+    filters = []
+    if category is not None:
+        filters.append(Question.category == category)
+    if difficulty is not None:
+        filters.append(Question.difficulty == difficulty)
+    return filters
+
+
+def search_vector():
+    # Must stay the expression of the `questions_search_idx` index
+    def weighted(column, weight):
+        return func.setweight(
+            func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, '')), weight)
+    return weighted(Question.question, 'A').op('||')(
+        weighted(Question.answer, 'B'))
+
+
+def highlight(text, words):
+    # Marks the words starting with one of `words`, like the prefix
+    # matching of the search
+    pattern = re.compile(
+        r'\b(?:{})\w*'.format('|'.join(map(re.escape, words))), re.IGNORECASE)
+    return pattern.sub(
+        lambda match: HIGHLIGHT_START + match.group(0) + HIGHLIGHT_STOP,
+        text or '')
+
+
+class InvertedIndex(object):
+    '''
+    In-process full text index of the questions, used when the database
+    has no text search (SQLite test runs).
+    Every word points to the questions containing it along with its weight
+    in each of them, search terms match the words they prefix.
+    '''
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        # id -> (words, category, difficulty)
+        self.documents = {}
+        self.sorted_words = None
+        self.lock = threading.Lock()
+
+    def add(self, id, question, answer, category, difficulty):
+        weights = defaultdict(float)
+        for word in search_words(question):
+            weights[word] += 1.0
+        for word in search_words(answer):
+            weights[word] += ANSWER_WEIGHT
+        with self.lock:
+            self._discard(id)
+            for word, weight in weights.items():
+                if word not in self.postings:
+                    self.sorted_words = None
+                self.postings[word][id] = weight
+            self.documents[id] = (tuple(weights), category, difficulty)
+
+    def discard(self, id):
+        with self.lock:
+            self._discard(id)
+
+    def _discard(self, id):
+        document = self.documents.pop(id, None)
+        if document is None:
+            return
+        for word in document[0]:
+            ids = self.postings[word]
+            del ids[id]
+            if not ids:
+                del self.postings[word]
+                self.sorted_words = None
+
+    def expand(self, term):
+        # Indexed words starting with `term`
+        if self.sorted_words is None:
+            self.sorted_words = sorted(self.postings)
+        words = self.sorted_words
+        start = bisect_left(words, term)
+        end = start
+        while end < len(words) and words[end].startswith(term):
+            end += 1
+        return words[start:end]
+
+    def search(self, terms, category=None, difficulty=None):
+        '''
+        Scores of the questions matching all `terms`, by id.
+        '''
+        scores = None
+        with self.lock:
+            for term in terms:
+                term_scores = defaultdict(float)
+                for word in self.expand(term):
+                    for id, weight in self.postings[word].items():
+                        term_scores[id] += weight
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {id: score + term_scores[id]
+                              for id, score in scores.items() if id in term_scores}
+                if not scores:
+                    return {}
+            if category is not None or difficulty is not None:
+                scores = {
+                    id: score for id, score in scores.items()
+                    if category in (None, self.documents[id][1])
+                    and difficulty in (None, self.documents[id][2])
+                }
+        return scores
+
+
+class QuestionSearch(object):
+    '''
+    Ranked full text search over the question and answer texts.
+
+    On Postgres the search runs through the `questions_search_idx` GIN
+    index, ranked by ts_rank and highlighted by ts_headline for the
+    returned page only. Other databases use an `InvertedIndex` built on the
+    first search and kept up to date by listeners on `Question`.
+    '''
+
+    def __init__(self):
+        self.index = None
+        self.index_lock = threading.Lock()
+        event.listen(Question, 'after_insert', self._indexed)
+        event.listen(Question, 'after_update', self._indexed)
+        event.listen(Question, 'after_delete', self._deleted)
+
+    def search(self, term, page, per_page, category=None, difficulty=None):
+        '''
+        Returns the `page` of `SearchResult`s of the questions matching every
+        word of `term` (by prefix) and the number of matches.
+        '''
+        words = search_words(term)
+        if not words:
+            return [], 0
+        page = max(page, 1)
+        if db.engine.dialect.name == 'postgresql':
+            return self._search_postgres(
+                words, page, per_page, category, difficulty)
+        return self._search_index(words, page, per_page, category, difficulty)
+
+    def _search_postgres(self, words, page, per_page, category, difficulty):
+        vector = search_vector()
+
+        def tsquery():
+            return func.to_tsquery(
+                SEARCH_CONFIG, ' & '.join(word + ':*' for word in words))
+
+        rank = func.ts_rank(vector, tsquery())
+        matches = db.session.query(Question.id).filter(
+            vector.op('@@')(tsquery()),
+            *question_filters(category, difficulty))
+        ranked = matches.add_columns(
+            rank.label('rank'),
+            func.count().over().label('total')
+        ).order_by(rank.desc(), Question.id) \
+            .limit(per_page).offset((page - 1) * per_page).subquery()
+        # headlines are computed on the rows of the page only
+        rows = db.session.query(
+            *QUESTION_COLUMNS,
+            ranked.c.total,
+            func.ts_headline(SEARCH_CONFIG, Question.question, tsquery(), HEADLINE_OPTIONS),
+            func.ts_headline(SEARCH_CONFIG, Question.answer, tsquery(), HEADLINE_OPTIONS)
+        ).join(ranked, ranked.c.id == Question.id) \
+            .order_by(ranked.c.rank.desc(), Question.id).all()
+        if not rows:
+            # past the last page the window has no row to report the total on
+            return [], matches.count() if page > 1 else 0
+        results = [
+            SearchResult(question, {'question': row[-2], 'answer': row[-1]})
+            for question, row in zip(question_dicts(rows), rows)
+        ]
+        return results, rows[0].total
+
+    def _search_index(self, words, page, per_page, category, difficulty):
+        scores = self._get_index().search(words, category, difficulty)
+        ids = [id for id, score in heapq.nsmallest(
+            page * per_page, scores.items(),
+            key=lambda item: (-item[1], item[0]))][(page - 1) * per_page:]
+        rows = {question['id']: question for question in question_dicts(
+            Question.query.with_entities(*QUESTION_COLUMNS)
+            .filter(Question.id.in_(ids)))} if ids else {}
+        results = [
+            SearchResult(rows[id], {
+                'question': highlight(rows[id]['question'], words),
+                'answer': highlight(rows[id]['answer'], words),
+            })
+            # rows deleted by another process are still indexed here
+            for id in ids if id in rows
+        ]
+        return results, len(scores)
+
+    def _get_index(self):
+        with self.index_lock:
+            if self.index is None:
+                index = InvertedIndex()
+                rows = Question.query.with_entities(
+                    Question.id, Question.question, Question.answer,
+                    Question.category, Question.difficulty
+                ).yield_per(INDEX_FETCH_SIZE)
+                for row in rows:
+                    index.add(*row)
+                self.index = index
+            return self.index
+
+    def invalidate(self):
+        # Rebuilt on the next search, after changes made without the ORM
+        with self.index_lock:
+            self.index = None
+
+    def _indexed(self, mapper, connection, target):
+        if self.index is not None:
+            self.index.add(target.id, target.question, target.answer,
+                           target.category, target.difficulty)
+
+    def _deleted(self, mapper, connection, target):
+        if self.index is not None:
+            self.index.discard(target.id)
+
+
+question_search = QuestionSearch()
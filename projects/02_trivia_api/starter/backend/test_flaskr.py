@@ -1,4 +1,5 @@
 import os
+import json
 import unittest
 from flask_sqlalchemy import SQLAlchemy
 
@@ -64,6 +65,78 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 201)
         self.assertFalse(data["error"])
 
+    def test_questions_import(self):
+        """Test bulk import of NDJSON and CSV questions"""
+        lines = [
+            {"question": "Which bulk loaded question is this ?",
+             "answer": "The first", "category": 1, "difficulty": 1},
+            {"question": "No", "answer": "Too short", "category": 1,
+             "difficulty": 1},
+        ]
+        body = "\n".join(map(json.dumps, lines)) + "\n{not json\n"
+        res = self.client().post('/questions/import', data=body,
+                                 content_type='application/x-ndjson')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(data["inserted"], 1)
+        self.assertEqual(data["rejected"], 2)
+        self.assertEqual([e["line"] for e in data["errors"]], [2, 3])
+
+        body = ("question,answer,category,difficulty\n"
+                "\"Which CSV loaded question is this ?\",Second,2,3\n")
+        res = self.client().post('/questions/import', data=body,
+                                 content_type='text/csv')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(data["inserted"], 1)
+        self.assertEqual(data["rejected"], 0)
+
+    def test_questions_export(self):
+        """Test streaming NDJSON export of a category"""
+        res = self.client().get('/questions/export?category=3')
+        questions = [json.loads(line) for line in res.data.splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertTrue(len(questions))
+        self.assertTrue(all(q["category"] == 3 for q in questions))
+        ids = [q["id"] for q in questions]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_questions_batch(self):
+        """Test batch update and delete of questions"""
+        res = self.client().post('/questions/import', data="\n".join(
+            json.dumps({"question": "Which batch question is this ?",
+                        "answer": "Number " + str(n), "category": 6,
+                        "difficulty": 1}) for n in range(3)),
+            content_type='application/x-ndjson')
+        self.assertEqual(res.get_json()["inserted"], 3)
+        with self.app.app_context():
+            ids = [q.id for q in Question.query.filter(
+                Question.question == "Which batch question is this ?")]
+
+        res = self.client().post('/questions/batch/update', json={
+            "ids": ids + [0], "values": {"difficulty": 5}})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["updated"], len(ids))
+        self.assertEqual([r["id"] for r in data["results"]], ids + [0])
+        self.assertFalse(data["results"][-1]["success"])
+
+        res = self.client().post('/questions/batch/delete', json={
+            "filter": {"category": 6, "difficulty": 5}})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertGreaterEqual(data["deleted"], len(ids))
+        self.assertTrue(all(r["success"] for r in data["results"]))
+        with self.app.app_context():
+            self.assertFalse(Question.query.filter(
+                Question.id.in_(ids)).count())
+
     def test_question_search(self):
         """Test Searching for a Question endpoint"""
         res = self.client().post('/questions/search',
@@ -73,6 +146,24 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(len(data["questions"]))
 
+    def test_question_search_ranked(self):
+        """Test Searching questions and answers with filters"""
+        res = self.client().post('/questions/search', json={
+            "searchTerm": "lake",
+            "category": 3,
+            "difficulty": 2
+        })
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["total_questions"], len(data["questions"]))
+        self.assertTrue(len(data["questions"]))
+        for question in data["questions"]:
+            self.assertEqual(int(question["category"]), 3)
+            self.assertEqual(question["difficulty"], 2)
+            self.assertIn("<mark>", question["highlight"]["question"] +
+                          question["highlight"]["answer"])
+
     def test_category_questions(self):
         """Test Grabbing Questions of a category endpoint"""
         res = self.client().get('/categories/3/questions')
@@ -81,6 +172,39 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(len(data["questions"]))
 
+    def test_category_questions_pages(self):
+        """Test Questions of a category are paginated with their total"""
+        questions = []
+        page = 1
+        while True:
+            res = self.client().get(
+                '/categories/3/questions?page=' + str(page))
+            data = res.get_json()
+
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(data["questions"]), 10)
+            if not data["questions"]:
+                break
+            questions += data["questions"]
+            page += 1
+        self.assertEqual(data["total_questions"], len(questions))
+        self.assertTrue(all(int(q["category"]) == 3 for q in questions))
+
+    def test_categories_etag(self):
+        """Test Categories endpoint revalidation"""
+        res = self.client().get('/categories')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(len(data["categories"]))
+        etag = res.headers["ETag"]
+        res = self.client().get('/categories',
+                                headers={"If-None-Match": etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers["ETag"], etag)
+        self.assertFalse(res.data)
+
     def test_quiz(self):
         """Test Quiz endpoint"""
         previous_questions = []
@@ -97,6 +221,46 @@ class TriviaTestCase(unittest.TestCase):
                             len(set(previous_questions)))
             previous_questions.append(data["question"]["id"])
 
+    def test_quiz_category_exhausted(self):
+        """Test Quiz endpoint asks every question of a category once"""
+        previous_questions = []
+        quiz_category = {"id": 3}
+        while True:
+            res = self.client().post('/quizzes', json={
+                "previous_questions": previous_questions,
+                "quiz_category": quiz_category,
+            })
+            data = res.get_json()
+
+            self.assertEqual(res.status_code, 200)
+            if data["question"] is None:
+                break
+            self.assertEqual(int(data["question"]["category"]), 3)
+            self.assertNotIn(data["question"]["id"], previous_questions)
+            previous_questions.append(data["question"]["id"])
+        self.assertTrue(len(previous_questions))
+
+    def test_quiz_session(self):
+        """Test Quiz session endpoints"""
+        res = self.client().post('/quizzes/sessions',
+                                 json={"quiz_category": {"id": 3}})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(data["total_questions"])
+        url = '/quizzes/sessions/' + data["session_id"] + '/next'
+        asked = []
+        for r in range(data["total_questions"]):
+            res = self.client().post(url)
+            question = res.get_json()["question"]
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(int(question["category"]), 3)
+            asked.append(question["id"])
+        self.assertEqual(len(asked), len(set(asked)))
+        res = self.client().post(url)
+        self.assertIsNone(res.get_json()["question"])
+
     # Failed scenarios
 
     def test_question_create_error(self):
@@ -121,6 +285,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 404)
         self.assertTrue(data["error"])
 
+    def test_questions_batch_error(self):
+        """Test batch endpoints reject invalid bodies"""
+        for url, body in [
+            ('/questions/batch/delete', {}),
+            ('/questions/batch/delete', {"filter": {}}),
+            ('/questions/batch/delete', {"ids": ["1"]}),
+            ('/questions/batch/update', {"ids": [1], "values": {}}),
+            ('/questions/batch/update', {"ids": [1],
+                                         "values": {"category": 999}}),
+        ]:
+            res = self.client().post(url, json=body)
+            data = res.get_json()
+
+            self.assertEqual(res.status_code, 400)
+            self.assertTrue(data["error"])
+
+    def test_quiz_session_not_found(self):
+        """Test Quiz session error endpoint"""
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 404)
+        self.assertTrue(data["error"])
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import json
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+import json_provider
+from models import db, Question, Category, QUESTION_COLUMNS, question_dicts
+
+
+class QuestionDictsTestCase(unittest.TestCase):
+    """This class represents the column tuple rendering of questions"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        db.session.add(Category('Science'))
+        db.session.flush()
+        for difficulty in (1, 4):
+            db.session.add(Question('Question {} ?'.format(difficulty),
+                                    'Answer', 1, difficulty))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_question_dicts_match_format(self):
+        """Test rows of QUESTION_COLUMNS render like Question.format()"""
+        rows = Question.query.with_entities(*QUESTION_COLUMNS) \
+            .order_by(Question.id).all()
+        questions = Question.query.order_by(Question.id).all()
+
+        self.assertEqual(question_dicts(rows),
+                         [question.format() for question in questions])
+
+
+class JSONProviderTestCase(unittest.TestCase):
+    """This class represents the responses of every JSON backend"""
+
+    DATA = {
+        'when': datetime(2020, 5, 17, 13, 30, 5),
+        'categories': {1: 'Science', 2: 'Art'},
+        'text': 'café',
+    }
+
+    def response(self, backend):
+        app = Flask(__name__)
+        app.config['JSON_BACKEND'] = backend
+        json_provider.init_app(app)
+        with app.app_context():
+            response = json_provider.jsonify(self.DATA)
+        self.assertEqual(response.mimetype, 'application/json')
+        return json.loads(response.get_data())
+
+    def test_json_backend(self):
+        """Test the standard library backend writes flask.jsonify dates"""
+        data = self.response('json')
+
+        self.assertEqual(data['when'], 'Sun, 17 May 2020 13:30:05 GMT')
+        self.assertEqual(data['categories'], {'1': 'Science', '2': 'Art'})
+        self.assertEqual(data['text'], 'café')
+
+    @unittest.skipUnless('orjson' in json_provider.BACKENDS, 'orjson not installed')
+    def test_orjson_backend(self):
+        """Test the orjson backend writes ISO 8601 dates and string keys"""
+        data = self.response('orjson')
+
+        self.assertEqual(data['when'], '2020-05-17T13:30:05')
+        self.assertEqual(data['categories'], {'1': 'Science', '2': 'Art'})
+        self.assertEqual(data['text'], 'café')
+
+    def test_unknown_backend(self):
+        """Test an unavailable JSON_BACKEND is refused"""
+        app = Flask(__name__)
+        app.config['JSON_BACKEND'] = 'yaml'
+
+        with self.assertRaises(RuntimeError):
+            json_provider.init_app(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,22 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .auth.auth import AuthError, requires_auth, verified_tokens
+from .auth.token_cache import register_token_cache_metrics
+from . import json_provider
+from .json_provider import jsonify
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+# orjson responses when it is installed
+json_provider.init_app(app)
+# hit and miss counters of the verified token cache
+register_token_cache_metrics(app, verified_tokens)
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -1,13 +1,25 @@
-import json
-from flask import request, _request_ctx_stack
+import os
+import sys
+from flask import request
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
 
+from .jwks import JWKSError
+from .signing_keys import key_source
+from .token_cache import VerifiedTokenCache, token_permissions
 
-AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
+
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'udacity-fsnd.auth0.com')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = 'dev'
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'dev')
+# How `requires_auth` combines several permissions
+ALL = 'all'
+ANY = 'any'
+# Keys verifying the tokens: the JWKS of the tenant, or the local key or
+# key set named by AUTH_KEY_FILE / JWKS_URL (see signing_keys.py)
+signing_keys = key_source(AUTH0_DOMAIN)
+# Payloads of the tokens already verified (see token_cache.py)
+verified_tokens = VerifiedTokenCache()
 
 ## AuthError Exception
 '''
@@ -23,64 +35,164 @@ class AuthError(Exception):
 ## Auth Header
 
 '''
-@TODO implement get_token_auth_header() method
-    it should attempt to get the header from the request
-        it should raise an AuthError if no header is present
-    it should attempt to split bearer and the token
-        it should raise an AuthError if the header is malformed
-    return the token part of the header
+get_token_auth_header()
+    returns the token of the request's "Authorization: Bearer <token>"
+    header, raises an AuthError if the header is missing or malformed
 '''
 def get_token_auth_header():
-   raise Exception('Not Implemented')
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if len(parts) != 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.' if len(parts) < 2
+            else 'Authorization header must be bearer token.'
+        }, 401)
+
+    elif parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    return parts[1]
 
 '''
-@TODO implement check_permissions(permission, payload) method
+check_permissions(permission, payload, match=ALL, granted=None)
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink') or a frozenset of
+            them (as built by `requires_auth`)
         payload: decoded jwt payload
+        match: ALL or ANY of the permissions must be granted
+        granted: frozenset of the payload permissions when already known
+            (cached with the token), read from the payload otherwise
 
-    it should raise an AuthError if permissions are not included in the payload
-        !!NOTE check your RBAC settings in Auth0
-    it should raise an AuthError if the requested permission string is not in the payload permissions array
-    return true otherwise
+    raises an AuthError if permissions are requested and the payload has
+    none (RBAC must be enabled in Auth0) or lacks them, returns True
+    otherwise
 '''
-def check_permissions(permission, payload):
-    raise Exception('Not Implemented')
+def check_permissions(permission, payload, match=ALL, granted=None):
+    required = frozenset([permission] if permission else []) \
+        if isinstance(permission, str) else permission
+    # a valid token is enough, with or without the permissions claim
+    if not required:
+        return True
+
+    if granted is None:
+        granted = token_permissions(payload)
+    if granted is None:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if match == ANY:
+        allowed = not granted.isdisjoint(required)
+    else:
+        allowed = required <= granted
+    if not allowed:
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission not found.'
+        }, 403)
+    return True
 
 '''
-@TODO implement verify_decode_jwt(token) method
+verify_decode_jwt(token)
     @INPUTS
         token: a json web token (string)
 
-    it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
-    it should decode the payload from the token
-    it should validate the claims
-    return the decoded payload
-
-    !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
+    verifies the token with the key of its kid (see signing_keys.py, a
+    JWKS is cached and refreshed in the background), validates the claims
+    and returns the decoded payload
 '''
 def verify_decode_jwt(token):
-    raise Exception('Not Implemented')
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 401)
+    if 'kid' not in unverified_header:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+
+    try:
+        rsa_key = signing_keys.get(unverified_header['kid'])
+    except JWKSError:
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 503)
+    if rsa_key is None:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to find the appropriate key.'
+        }, 400)
+
+    try:
+        return jwt.decode(
+            token,
+            rsa_key,
+            algorithms=ALGORITHMS,
+            audience=API_AUDIENCE,
+            issuer='https://' + AUTH0_DOMAIN + '/'
+        )
+
+    except jwt.ExpiredSignatureError:
+        raise AuthError({
+            'code': 'token_expired',
+            'description': 'Token expired.'
+        }, 401)
+
+    except jwt.JWTClaimsError:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Incorrect claims. Please, check the audience and issuer.'
+        }, 401)
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
 
 '''
-@TODO implement @requires_auth(permission) decorator method
+@requires_auth(*permissions, match=ALL) decorator method
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permissions: string permissions (i.e. 'post:drink'), none to only
+            require a valid token
+        match: ALL (default) or ANY of them must be granted
 
-    it should use the get_token_auth_header method to get the token
-    it should use the verify_decode_jwt method to decode the jwt
-    it should use the check_permissions method validate claims and check the requested permission
-    return the decorator which passes the decoded payload to the decorated method
+    reads the bearer token, verifies it (unless it was verified already and
+    hasn't expired) and checks the requested permissions then passes the
+    decoded payload to the decorated method. The permissions are interned
+    into a frozenset once, when the method is decorated.
 '''
-def requires_auth(permission=''):
+def requires_auth(*permissions, match=ALL):
+    if match not in (ALL, ANY):
+        raise ValueError('match must be ALL or ANY')
+    required = frozenset(sys.intern(permission)
+                         for permission in permissions if permission)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
-            return f(payload, *args, **kwargs)
+            verified = verified_tokens.get(token)
+            if verified is None:
+                verified = verified_tokens.put(token, verify_decode_jwt(token))
+            check_permissions(required, verified.payload, match,
+                              verified.permissions)
+            return f(verified.payload, *args, **kwargs)
 
         return wrapper
-    return requires_auth_decorator
\ No newline at end of file
+    return requires_auth_decorator
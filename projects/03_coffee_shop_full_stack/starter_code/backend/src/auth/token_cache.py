@@ -0,0 +1,119 @@
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import abort, jsonify, request
+
+# Cache of verified access tokens. BasicFlaskAuth keeps a copy of the coffee
+# shop's src/auth/token_cache.py, written by `python tools/shared_files.py
+# --sync`. Clients send the same bearer token for many
+# requests, a cached token skips the signature check and claims validation
+# until its `exp`. Entries are keyed by the SHA-256 digest of the token so
+# the tokens themselves are not kept in memory, the least recently used
+# are dropped first once MAX_TOKENS are cached. The `permissions` claim
+# is turned into a frozenset of interned strings once per token, checking
+# a permission is then a set lookup.
+# The counters are off unless a METRICS_TOKEN is set (app config first,
+# then the environment), they are then served to the requests sending it
+# in the X-Metrics-Token header.
+MAX_TOKENS = 4096
+METRICS_RULE = '/internal/auth-cache'
+METRICS_TOKEN_HEADER = 'X-Metrics-Token'
+
+
+# A verified payload with its permissions, None when the payload has no
+# `permissions` claim (RBAC disabled)
+VerifiedToken = namedtuple('VerifiedToken', ['payload', 'permissions'])
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+def token_permissions(payload):
+    permissions = payload.get('permissions')
+    if not isinstance(permissions, list):
+        return None
+    return frozenset(sys.intern(permission) for permission in permissions
+                     if isinstance(permission, str))
+
+
+class VerifiedTokenCache(object):
+    '''
+    Bounded LRU of verified token payloads, see the top of this file.
+    '''
+
+    def __init__(self, max_tokens=MAX_TOKENS):
+        self.max_tokens = max_tokens
+        # digest -> (VerifiedToken, exp)
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        '''
+        VerifiedToken of `token`, None when it isn't cached or expired.
+        '''
+        digest = token_digest(token)
+        with self.lock:
+            entry = self.tokens.get(digest)
+            if entry is not None and entry[1] > time.time():
+                self.tokens.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self.tokens[digest]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        '''
+        Caches the verified `payload` of `token`, returns its VerifiedToken.
+        Tokens without a numeric `exp` are verified on every request.
+        '''
+        verified = VerifiedToken(payload, token_permissions(payload))
+        exp = payload.get('exp')
+        if not isinstance(exp, (int, float)) or exp <= time.time():
+            return verified
+        digest = token_digest(token)
+        with self.lock:
+            self.tokens[digest] = (verified, exp)
+            self.tokens.move_to_end(digest)
+            while len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+        return verified
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def as_dict(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'tokens': len(self.tokens),
+                'max_tokens': self.max_tokens,
+            }
+
+
+def register_token_cache_metrics(app, cache, rule=METRICS_RULE):
+    # Counters of the worker serving the request
+    token = app.config.get('METRICS_TOKEN') or os.environ.get('METRICS_TOKEN')
+    if not token or 'token_cache_metrics' in app.view_functions:
+        return
+    token = token.encode('utf-8')
+
+    def token_cache_metrics():
+        sent = request.headers.get(METRICS_TOKEN_HEADER, '').encode('utf-8')
+        if not hmac.compare_digest(sent, token):
+            abort(404)
+        return jsonify(cache.as_dict())
+
+    app.add_url_rule(rule, 'token_cache_metrics', token_cache_metrics)
@@ -1,6 +1,9 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, TypeDecorator, event
+from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
+from .engine_config import configure_engine, register_pool_metrics
 import json
 
 database_filename = "database.db"
@@ -16,8 +19,10 @@ setup_db(app)
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    configure_engine(app)
     db.app = app
     db.init_app(app)
+    register_pool_metrics(app, db)
 
 '''
 db_drop_and_create_all()
@@ -29,6 +34,36 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+Recipe
+    the ingredients of a drink stored as a JSON string, parsed once when
+    the row is loaded (recipes are lists in Python)
+'''
+class Recipe(TypeDecorator):
+    impl = String
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else json.loads(value)
+
+
+class RecipeList(MutableList):
+    # Recipes changed in place (`drink.recipe.append(...)`) are saved on
+    # commit, a JSON string assigned to the column is parsed
+    @classmethod
+    def coerce(cls, key, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return super(RecipeList, cls).coerce(key, value)
+
+
+def short_recipe(recipe):
+    return [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -40,31 +75,52 @@ class Drink(db.Model):
     title = Column(String(80), unique=True)
     # the ingredients blob - this stores a lazy json blob
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    # a JSON string assigned to it is parsed, changes to the list itself are
+    # tracked but not the ones made inside an ingredient dict
+    recipe =  Column(RecipeList.as_mutable(Recipe(180)), nullable=False)
+
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        self.projections = None
+        return json.loads(recipe) if isinstance(recipe, str) else recipe
+
+    @validates('id', 'title')
+    def validate_field(self, key, value):
+        self.projections = None
+        return value
 
     '''
     short()
-        short form representation of the Drink model
+        short form representation of the Drink model, computed once until
+        the drink changes, callers get their own copy
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': short_recipe
-        }
+        return copy_projection(self.project()['short'])
 
     '''
     long()
-        long form representation of the Drink model
+        long form representation of the Drink model, computed once until
+        the drink changes, callers get their own copy
     '''
     def long(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': json.loads(self.recipe)
-        }
+        return copy_projection(self.project()['long'])
+
+    def project(self):
+        projections = getattr(self, 'projections', None)
+        if projections is None:
+            projections = self.projections = {
+                'short': {
+                    'id': self.id,
+                    'title': self.title,
+                    'recipe': short_recipe(self.recipe)
+                },
+                'long': {
+                    'id': self.id,
+                    'title': self.title,
+                    'recipe': [dict(part) for part in self.recipe]
+                },
+            }
+        return projections
 
     '''
     insert()
@@ -104,4 +160,46 @@ class Drink(db.Model):
         db.session.commit()
 
     def __repr__(self):
-        return json.dumps(self.short())
\ No newline at end of file
+        return '<Drink {} {!r}>'.format(self.id, self.title)
+
+
+def copy_projection(projection):
+    return dict(projection, recipe=[dict(part) for part in projection['recipe']])
+
+
+# Projections are dropped when the row is reloaded (after a commit) or
+# expired, and when the recipe is changed in place
+@event.listens_for(Drink, 'refresh')
+@event.listens_for(Drink, 'expire')
+def drink_reloaded(drink, *args):
+    drink.projections = None
+
+
+@event.listens_for(Drink.recipe, 'modified')
+def recipe_modified(drink, initiator):
+    drink.projections = None
+
+
+'''
+short_drinks(rows), long_drinks(rows)
+    `Drink.short()` and `Drink.long()` dicts of rows selected with
+    `query.with_entities(*DRINK_COLUMNS)`, list endpoints skip building
+    (and tracking) a Drink object per row
+'''
+DRINK_COLUMNS = (Drink.id, Drink.title, Drink.recipe)
+
+
+def short_drinks(rows):
+    return [{
+        'id': id,
+        'title': title,
+        'recipe': short_recipe(recipe)
+    } for id, title, recipe in rows]
+
+
+def long_drinks(rows):
+    return [{
+        'id': id,
+        'title': title,
+        'recipe': recipe
+    } for id, title, recipe in rows]
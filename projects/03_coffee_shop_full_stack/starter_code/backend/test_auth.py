@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest import mock
+
+from flask import Flask, jsonify
+
+from src.auth import auth
+from src.auth.auth import AuthError, check_permissions, requires_auth, ANY
+from src.auth.signing_keys import LocalKeySource, generate_key, mint_token
+
+
+class CheckPermissionsTestCase(unittest.TestCase):
+    """This class represents the permission checks of the auth module"""
+
+    def test_no_permission_required_without_permissions_claim(self):
+        """Test a token without permissions passes when none is required"""
+        self.assertTrue(check_permissions('', {'sub': 'user'}))
+        self.assertTrue(check_permissions(frozenset(), {'sub': 'user'}))
+        self.assertTrue(check_permissions(frozenset(), {'sub': 'user'}, ANY))
+
+    def test_permission_required_without_permissions_claim(self):
+        """Test a token without permissions fails when one is required"""
+        with self.assertRaises(AuthError) as context:
+            check_permissions('get:drinks-detail', {'sub': 'user'})
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_permission_missing(self):
+        """Test a token lacking the required permission"""
+        with self.assertRaises(AuthError) as context:
+            check_permissions('post:drinks', {'permissions': ['get:drinks-detail']})
+        self.assertEqual(context.exception.status_code, 403)
+
+    def test_permission_granted(self):
+        """Test a token holding the required permission"""
+        self.assertTrue(check_permissions(
+            'post:drinks', {'permissions': ['get:drinks-detail', 'post:drinks']}))
+
+
+class LocalTokenTestCase(unittest.TestCase):
+    """This class represents tokens minted with a local key"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pem = generate_key(1024)
+
+    def setUp(self):
+        # no AUTH0_DOMAIN or API_AUDIENCE, the defaults of auth.py apply
+        self.environ = mock.patch.dict(os.environ)
+        self.environ.start()
+        os.environ.pop('AUTH0_DOMAIN', None)
+        os.environ.pop('API_AUDIENCE', None)
+        self.signing_keys = auth.signing_keys
+        auth.signing_keys = LocalKeySource(self.pem)
+        auth.verified_tokens.clear()
+
+        self.app = Flask(__name__)
+
+        @self.app.route('/drinks-detail')
+        @requires_auth('get:drinks-detail')
+        def drinks_detail(payload):
+            return jsonify(payload)
+
+        self.client = self.app.test_client
+
+    def tearDown(self):
+        auth.signing_keys = self.signing_keys
+        auth.verified_tokens.clear()
+        self.environ.stop()
+
+    def test_minted_token_passes_requires_auth(self):
+        """Test a minted token is accepted with the default settings"""
+        token = mint_token(self.pem, ['get:drinks-detail'])
+        res = self.client().get('/drinks-detail', headers={
+            'Authorization': 'Bearer ' + token})
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['iss'], 'https://' + auth.AUTH0_DOMAIN + '/')
+        self.assertEqual(data['aud'], auth.API_AUDIENCE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.request import urlopen
+
+from src.auth import jwks
+from src.auth.jwks import JWKSCache, JWKSError
+from src.auth.signing_keys import LocalKeySource, generate_key, serve_jwks
+
+
+class CountingOpener(object):
+    """urlopen counting its calls, failing while `down` is set"""
+
+    def __init__(self, release=None):
+        self.calls = 0
+        self.down = False
+        self.release = release
+        self.lock = threading.Lock()
+
+    def __call__(self, url, timeout):
+        with self.lock:
+            self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.down:
+            raise OSError('IdP unreachable')
+        return urlopen(url, timeout=timeout)
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the JWKS cache, against a local key set file"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.jwk = LocalKeySource(generate_key(1024)).jwk
+        handle, cls.path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as file:
+            json.dump({'keys': [cls.jwk]}, file)
+        cls.url = 'file://' + cls.path
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+
+    def test_kid_lookup(self):
+        """Test keys are found by kid with a single download"""
+        opener = CountingOpener()
+        cache = JWKSCache(self.url, opener=opener)
+
+        self.assertEqual(cache.get(self.jwk['kid']), self.jwk)
+        self.assertEqual(cache.get(self.jwk['kid']), self.jwk)
+        self.assertEqual(opener.calls, 1)
+
+    def test_unknown_kid_is_cached(self):
+        """Test an unknown kid triggers one download, then is rejected"""
+        opener = CountingOpener()
+        cache = JWKSCache(self.url, opener=opener)
+        cache.get(self.jwk['kid'])
+
+        with mock.patch.object(jwks, 'MIN_FETCH_INTERVAL', 0):
+            cache.next_fetch = 0.0
+            self.assertIsNone(cache.get('unknown'))
+            self.assertEqual(opener.calls, 2)
+            self.assertIsNone(cache.get('unknown'))
+            self.assertEqual(opener.calls, 2)
+        self.assertGreater(cache.unknown['unknown'],
+                           time.monotonic() + jwks.NEGATIVE_TTL - 60)
+
+    def test_keys_served_during_outage(self):
+        """Test the last keys are used while the IdP is unreachable"""
+        opener = CountingOpener()
+        cache = JWKSCache(self.url, opener=opener)
+        cache.get(self.jwk['kid'])
+        opener.down = True
+        # the key set is stale and may be downloaded again
+        cache.expires = cache.next_fetch = 0.0
+
+        with self.assertLogs(jwks.logger, 'WARNING'):
+            self.assertEqual(cache.get(self.jwk['kid']), self.jwk)
+            self.assertIsNone(cache.get('unknown'))
+            for _ in range(50):
+                if not cache.refreshing:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(cache.get(self.jwk['kid']), self.jwk)
+        self.assertGreater(cache.next_fetch, time.monotonic())
+
+    def test_unreachable_without_keys(self):
+        """Test JWKSError is raised when no key set was ever downloaded"""
+        opener = CountingOpener()
+        opener.down = True
+        cache = JWKSCache(self.url, opener=opener)
+
+        with self.assertLogs(jwks.logger, 'WARNING'), \
+                self.assertRaises(JWKSError):
+            cache.get(self.jwk['kid'])
+
+    def test_single_download_for_concurrent_misses(self):
+        """Test concurrent lookups wait for a single download"""
+        release = threading.Event()
+        opener = CountingOpener(release)
+        cache = JWKSCache(self.url, opener=opener)
+        results = []
+
+        def lookup(kid):
+            results.append(cache.get(kid))
+
+        threads = [threading.Thread(target=lookup, args=(kid,))
+                   for kid in [self.jwk['kid']] * 5 + ['unknown'] * 5]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(opener.calls, 1)
+        self.assertEqual(results.count(self.jwk), 5)
+        self.assertEqual(results.count(None), 5)
+
+    def test_single_background_refresh(self):
+        """Test stale keys are refreshed by one background download"""
+        release = threading.Event()
+        release.set()
+        opener = CountingOpener(release)
+        cache = JWKSCache(self.url, opener=opener)
+        cache.get(self.jwk['kid'])
+        release.clear()
+        cache.expires = cache.next_fetch = 0.0
+
+        for _ in range(10):
+            self.assertEqual(cache.get(self.jwk['kid']), self.jwk)
+        release.set()
+        for _ in range(50):
+            if not cache.refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual(opener.calls, 2)
+        self.assertGreater(cache.expires, time.monotonic())
+
+
+class StubServerTestCase(unittest.TestCase):
+    """This class represents the JWKS cache against a stub IdP"""
+
+    def test_cache_control_of_the_server(self):
+        """Test the max-age of the server sets the lifetime of the keys"""
+        jwk = LocalKeySource(generate_key(1024)).jwk
+        server = serve_jwks({'keys': [jwk]}, max_age=120)
+        try:
+            cache = JWKSCache(server.jwks_url)
+            self.assertEqual(cache.get(jwk['kid']), jwk)
+            self.assertAlmostEqual(cache.expires - time.monotonic(), 120, delta=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
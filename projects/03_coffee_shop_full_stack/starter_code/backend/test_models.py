@@ -0,0 +1,82 @@
+import unittest
+
+from flask import Flask
+
+from src.database.models import db, Drink, DRINK_COLUMNS, short_drinks, long_drinks
+
+WATER = {'color': 'blue', 'name': 'water', 'parts': 1}
+ICE = {'color': 'white', 'name': 'ice', 'parts': 2}
+
+
+class DrinkTestCase(unittest.TestCase):
+    """This class represents the Drink model and its cached projections"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.drink = Drink(title='water', recipe=[dict(WATER)])
+        self.drink.insert()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def reloaded(self):
+        id = self.drink.id
+        db.session.expunge_all()
+        return Drink.query.get(id)
+
+    def test_in_place_append_is_saved(self):
+        """Test an ingredient appended to the recipe is committed"""
+        self.drink.recipe.append(dict(ICE))
+        self.drink.update()
+
+        self.assertEqual(self.reloaded().recipe, [WATER, ICE])
+
+    def test_in_place_edit_refreshes_projections(self):
+        """Test the projections follow in place changes of the recipe"""
+        self.assertEqual(self.drink.long()['recipe'], [WATER])
+        self.drink.recipe.append(dict(ICE))
+
+        self.assertEqual(self.drink.long()['recipe'], [WATER, ICE])
+        self.assertEqual(self.drink.short()['recipe'], [
+            {'color': 'blue', 'parts': 1}, {'color': 'white', 'parts': 2}])
+        del self.drink.recipe[0]
+        self.assertEqual(self.drink.long()['recipe'], [ICE])
+
+    def test_projections_are_copies(self):
+        """Test changing a projection leaves the drink untouched"""
+        self.drink.long()['recipe'].append(dict(ICE))
+        self.drink.long()['recipe'][0]['parts'] = 5
+        self.drink.short()['recipe'].clear()
+
+        self.assertEqual(self.drink.recipe, [WATER])
+        self.assertEqual(self.drink.long()['recipe'], [WATER])
+        self.assertEqual(len(self.drink.short()['recipe']), 1)
+        self.assertNotIn(self.drink, db.session.dirty)
+
+    def test_json_string_recipe(self):
+        """Test a recipe assigned as a JSON string is parsed and tracked"""
+        self.drink.recipe = '[{"color": "white", "name": "ice", "parts": 2}]'
+        self.assertEqual(self.drink.long()['recipe'], [ICE])
+        self.drink.recipe.append(dict(WATER))
+        self.drink.update()
+
+        self.assertEqual(self.reloaded().recipe, [ICE, WATER])
+
+    def test_column_rows_render_like_drinks(self):
+        """Test rows of DRINK_COLUMNS render like short() and long()"""
+        rows = Drink.query.with_entities(*DRINK_COLUMNS).all()
+
+        self.assertEqual(short_drinks(rows), [self.drink.short()])
+        self.assertEqual(long_drinks(rows), [self.drink.long()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from src.auth import token_cache
+from src.auth.token_cache import VerifiedTokenCache, register_token_cache_metrics
+
+NOW = 1000000.0
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the cache of verified tokens"""
+
+    def setUp(self):
+        # the cache reads the clock through `token_cache.time`
+        self.clock = mock.patch.object(token_cache, 'time')
+        self.time = self.clock.start()
+        self.time.time.return_value = NOW
+
+    def tearDown(self):
+        self.clock.stop()
+
+    def payload(self, exp=NOW + 60, **claims):
+        claims['exp'] = exp
+        return claims
+
+    def test_hit_until_expiry(self):
+        """Test a token is served from the cache until its exp"""
+        cache = VerifiedTokenCache()
+        verified = cache.put('token', self.payload(permissions=['get:drinks']))
+
+        self.assertIs(cache.get('token'), verified)
+        self.assertEqual(verified.permissions, frozenset(['get:drinks']))
+        self.time.time.return_value = NOW + 61
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(len(cache.tokens), 0)
+
+    def test_tokens_without_future_exp_are_not_cached(self):
+        """Test tokens without exp, or already expired, are not kept"""
+        cache = VerifiedTokenCache()
+        cache.put('no-exp', {'sub': 'user'})
+        cache.put('expired', self.payload(exp=NOW - 1))
+
+        self.assertIsNone(cache.get('no-exp'))
+        self.assertIsNone(cache.get('expired'))
+        self.assertEqual(len(cache.tokens), 0)
+
+    def test_least_recently_used_are_dropped(self):
+        """Test the cache keeps at most max_tokens, the most recently used"""
+        cache = VerifiedTokenCache(max_tokens=2)
+        cache.put('first', self.payload())
+        cache.put('second', self.payload())
+        cache.get('first')
+        cache.put('third', self.payload())
+
+        self.assertEqual(len(cache.tokens), 2)
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('third'))
+
+    def test_counters(self):
+        """Test hits and misses are counted"""
+        cache = VerifiedTokenCache(max_tokens=10)
+        cache.get('token')
+        cache.put('token', self.payload())
+        cache.get('token')
+        cache.get('token')
+
+        self.assertEqual(cache.as_dict(), {
+            'hits': 2,
+            'misses': 1,
+            'hit_ratio': 2 / 3,
+            'tokens': 1,
+            'max_tokens': 10,
+        })
+
+
+class TokenCacheMetricsTestCase(unittest.TestCase):
+    """This class represents the endpoint serving the cache counters"""
+
+    def setUp(self):
+        self.environ = mock.patch.dict(os.environ)
+        self.environ.start()
+        os.environ.pop('METRICS_TOKEN', None)
+        self.cache = VerifiedTokenCache()
+        self.cache.get('token')
+        self.app = Flask(__name__)
+
+    def tearDown(self):
+        self.environ.stop()
+
+    def test_metrics_off_without_token(self):
+        """Test the endpoint is not registered without METRICS_TOKEN"""
+        register_token_cache_metrics(self.app, self.cache)
+        res = self.app.test_client().get(token_cache.METRICS_RULE)
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_metrics_require_the_token(self):
+        """Test the counters are only served to requests with the token"""
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        register_token_cache_metrics(self.app, self.cache)
+        client = self.app.test_client()
+
+        res = client.get(token_cache.METRICS_RULE)
+        self.assertEqual(res.status_code, 404)
+        res = client.get(token_cache.METRICS_RULE,
+                         headers={token_cache.METRICS_TOKEN_HEADER: 'wrong'})
+        self.assertEqual(res.status_code, 404)
+        res = client.get(token_cache.METRICS_RULE,
+                         headers={token_cache.METRICS_TOKEN_HEADER: 'secret'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
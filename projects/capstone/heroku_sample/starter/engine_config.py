@@ -0,0 +1,176 @@
+import hmac
+import os
+import threading
+import time
+from flask import abort, jsonify, request
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Engine settings shared by the Flask-SQLAlchemy apps. Every app keeps a
+# copy written from projects/01_fyyur/starter_code/engine_config.py, edit
+# that one then run `python tools/shared_files.py --sync`. Pool tuning is
+# read from the environment:
+#   DB_POOL_SIZE          connections kept open per process
+#   DB_MAX_OVERFLOW       extra connections opened under load, then closed
+#   DB_POOL_TIMEOUT       seconds to wait for a connection before failing
+#   DB_POOL_RECYCLE       seconds after which a connection is replaced
+#   DB_POOL_PRE_PING      1 to test connections on checkout
+#   DB_STATEMENT_TIMEOUT  milliseconds before Postgres cancels a statement,
+#                         0 disables it
+ENGINE_DEFAULTS = {
+    'DB_POOL_SIZE': '5',
+    'DB_MAX_OVERFLOW': '10',
+    'DB_POOL_TIMEOUT': '30',
+    'DB_POOL_RECYCLE': '1800',
+    'DB_POOL_PRE_PING': '1',
+    'DB_STATEMENT_TIMEOUT': '0',
+}
+# Pool metrics are off unless a METRICS_TOKEN is set (app config first,
+# then the environment), they are then served to the requests sending it
+# in the X-Metrics-Token header
+METRICS_RULE = '/internal/pool'
+METRICS_TOKEN_HEADER = 'X-Metrics-Token'
+
+
+def env_setting(name, environ=None):
+    environ = os.environ if environ is None else environ
+    return environ.get(name) or ENGINE_DEFAULTS[name]
+
+
+def engine_options(uri, environ=None):
+    '''
+    SQLALCHEMY_ENGINE_OPTIONS for `uri`. SQLite keeps the pools chosen
+    by Flask-SQLAlchemy, they don't take sizing arguments.
+    '''
+    def setting(name):
+        return env_setting(name, environ)
+
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': int(setting('DB_POOL_SIZE')),
+        'max_overflow': int(setting('DB_MAX_OVERFLOW')),
+        'pool_timeout': float(setting('DB_POOL_TIMEOUT')),
+        'pool_recycle': int(setting('DB_POOL_RECYCLE')),
+        'pool_pre_ping': setting('DB_POOL_PRE_PING') == '1',
+    }
+    statement_timeout = int(setting('DB_STATEMENT_TIMEOUT'))
+    # 'postgres' is the older alias of the postgresql dialect
+    if statement_timeout and url.get_backend_name() in ('postgresql', 'postgres'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(statement_timeout)}
+    return options
+
+
+def configure_engine(app):
+    # Options set explicitly in the app config take precedence
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+class PoolMetrics(object):
+    '''
+    Counters of a connection pool since the process started, checkouts are
+    timed from the request for a connection until it is handed out.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def checked_out(self, wait, overflowed):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if overflowed:
+                self.overflow_events += 1
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_seconds_total': self.wait_seconds,
+                'wait_seconds_mean': self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+                'wait_seconds_max': self.max_wait_seconds,
+                'overflow_events': self.overflow_events,
+                'timeouts': self.timeouts,
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    '''
+    QueuePool recording checkout wait times, connections opened beyond
+    `pool_size` and checkouts that gave up after `pool_timeout`.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(MeteredQueuePool, self).__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow = self._overflow
+        try:
+            connection = super(MeteredQueuePool, self)._do_get()
+        except TimeoutError:
+            self.metrics.timed_out()
+            raise
+        self.metrics.checked_out(
+            time.perf_counter() - started,
+            self._overflow > overflow and self._overflow > 0)
+        return connection
+
+    def recreate(self):
+        # `engine.dispose()` swaps the pool, the counters carry over
+        pool = super(MeteredQueuePool, self).recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_status(pool):
+    status = {'pool': type(pool).__name__, 'pid': os.getpid()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.metrics.as_dict())
+    return status
+
+
+def metrics_token(app, environ=None):
+    environ = os.environ if environ is None else environ
+    return app.config.get('METRICS_TOKEN') or environ.get('METRICS_TOKEN')
+
+
+def register_pool_metrics(app, db, rule=METRICS_RULE):
+    # Every worker has its own pool, each request reports the pool of the
+    # worker serving it (see `pid`)
+    token = metrics_token(app)
+    if not token or 'pool_metrics' in app.view_functions:
+        return
+    token = token.encode('utf-8')
+
+    def pool_metrics():
+        sent = request.headers.get(METRICS_TOKEN_HEADER, '').encode('utf-8')
+        if not hmac.compare_digest(sent, token):
+            abort(404)
+        return jsonify(pool_status(db.engine.pool))
+
+    app.add_url_rule(rule, 'pool_metrics', pool_metrics)
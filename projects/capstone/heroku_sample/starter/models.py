@@ -1,5 +1,7 @@
-from sqlalchemy import Column, String, create_engine
+import os
+from sqlalchemy import Column, String, Integer, create_engine
 from flask_sqlalchemy import SQLAlchemy
+from engine_config import configure_engine, register_pool_metrics
 import json
 
 database_path = os.environ['DATABASE_URL']
@@ -13,8 +15,10 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    configure_engine(app)
     db.app = app
     db.init_app(app)
+    register_pool_metrics(app, db)
     db.create_all()
 
 
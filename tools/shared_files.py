@@ -0,0 +1,60 @@
+'''
+Modules kept as identical copies in several apps. Every app is deployed
+from its own directory (a Heroku app root, a Flask app folder) and imports
+its own copy, so each group below has one source, its first path, that
+the other copies are written from.
+
+    python tools/shared_files.py          # fails when a copy differs
+    python tools/shared_files.py --sync   # rewrites the copies
+
+Run from the root of the repository.
+'''
+import argparse
+import filecmp
+import shutil
+import sys
+
+SHARED_FILES = {
+    'engine_config.py': [
+        'projects/01_fyyur/starter_code/engine_config.py',
+        'projects/02_trivia_api/starter/backend/engine_config.py',
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src/database/engine_config.py',
+        'projects/capstone/heroku_sample/starter/engine_config.py',
+    ],
+}
+SHARED_FILES['json_provider.py'] = [
+    'projects/02_trivia_api/starter/backend/json_provider.py',
+    'projects/03_coffee_shop_full_stack/starter_code/backend/src/json_provider.py',
+]
+for name in ('jwks.py', 'token_cache.py', 'signing_keys.py'):
+    SHARED_FILES[name] = [
+        'projects/03_coffee_shop_full_stack/starter_code/backend/src/auth/' + name,
+        'BasicFlaskAuth/' + name,
+    ]
+
+
+def stale_copies(groups=SHARED_FILES):
+    # (source, copy) pairs whose copy differs from the source
+    return [(paths[0], path) for paths in groups.values()
+            for path in paths[1:] if not filecmp.cmp(paths[0], path, shallow=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sync', action='store_true',
+                        help='copy every source over its copies')
+    args = parser.parse_args()
+
+    stale = stale_copies()
+    for source, path in stale:
+        if args.sync:
+            shutil.copyfile(source, path)
+            print('{} <- {}'.format(path, source))
+        else:
+            print('{} differs from {}'.format(path, source), file=sys.stderr)
+    if stale and not args.sync:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()